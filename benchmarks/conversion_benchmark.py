@@ -0,0 +1,283 @@
+"""Benchmark conversion throughput on synthetic Open-X-Embodiment episodes."""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import foxglove
+import numpy as np
+import tensorflow as tf
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from synthetic import LAYOUTS, build_dataset
+from common.images import DEPTH_FORMATS, IMAGE_PRESETS, apply_image_preset, parse_image_codecs
+from common.messages import MESSAGE_ENCODINGS
+from common.schemas import DatasetSchema
+from open_x_embodiment.converter import convert_episode, batch_convert_episodes, batch_log_times, step_log_time
+from open_x_embodiment.data_loader import load_builder, iter_episodes
+
+
+class NullFile:
+    """Writable file object that discards its data, to run conversion without disk I/O."""
+
+    def __init__(self):
+        self.position = 0
+        self.size = 0
+
+    def write(self, data):
+        self.position += len(data)
+        self.size = max(self.size, self.position)
+        return len(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            self.position = offset
+        elif whence == os.SEEK_CUR:
+            self.position += offset
+        else:
+            self.position = self.size + offset
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+
+def peak_rss_mb():
+    """Get the peak resident set size of this process and of its finished children in MB"""
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return {"self": own / 1e6, "children": children / 1e6}
+
+
+def materialize(episode):
+    """Read all steps of an episode into an in-memory dataset"""
+    steps = episode["steps"].cache()
+    for _ in steps:
+        pass
+    return {"steps": steps}
+
+
+def to_numpy(step):
+    """Convert every tensor of a step to a NumPy array"""
+    if isinstance(step, dict):
+        return {key: to_numpy(value) for key, value in step.items()}
+    return np.asarray(step)
+
+
+def convert_in_memory(episode, dataset_name, schema_options, control_rate_hz, step_batch_size):
+    """Run the conversion loop of `convert_episode` into an MCAP writer that discards its output
+
+    Returns:
+        int: Size of the MCAP data in bytes
+    """
+    sink = NullFile()
+    schema = DatasetSchema.get_schema_for_dataset(dataset_name, **schema_options)
+    writer = foxglove.open_mcap(sink)
+    try:
+        # Channels as `convert_episode` publishes them, without its pipeline, profiling and preview wrappers
+        channels = schema.latch(schema.select_channels(schema.setup_channels()))
+        if step_batch_size > 1:
+            num_steps = 0
+            for batch in episode["steps"].batch(step_batch_size):
+                log_times = batch_log_times(batch, num_steps, 0, control_rate_hz)
+                schema.process_steps(batch, channels, False, log_times)
+                num_steps += len(log_times)
+        else:
+            for i, step in enumerate(episode["steps"]):
+                schema.process_step(step, channels, False, step_log_time(step, i, 0, control_rate_hz))
+        schema.finish()
+    finally:
+        schema.close()
+        writer.close()
+    return sink.size
+
+
+def bench_episode(dataset_name, data_root, output_dir, episodes, schema_options, control_rate_hz, step_batch_size,
+                  pipeline):
+    """Convert episodes one by one with `convert_episode`, splitting the time per stage.
+
+    Stages are measured by difference: `load` reads an episode from the
+    dataset, `numpy` converts every tensor of it to NumPy, `serialize` runs
+    the schema into an MCAP writer that discards its output (message
+    construction, encoding and chunk compression, minus `numpy`), and
+    `write` is what `convert_episode` takes on top of that to write the file.
+    """
+    builder = load_builder(dataset_name, 0, episodes - 1, data_root=data_root)
+    stages = {"load": 0.0, "numpy": 0.0, "serialize": 0.0, "write": 0.0}
+    convert_time = 0.0
+    num_steps = 0
+    written = 0
+
+    read_start = time.perf_counter()
+    for episode_num, episode in iter_episodes(
+            builder, 0, episodes - 1, skip_image_decoding=schema_options["image_passthrough"]):
+        episode = materialize(episode)
+        stages["load"] += time.perf_counter() - read_start
+
+        start = time.perf_counter()
+        for step in episode["steps"]:
+            to_numpy(step)
+        numpy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        convert_in_memory(episode, dataset_name, schema_options, control_rate_hz, step_batch_size)
+        in_memory_time = time.perf_counter() - start
+
+        output_file = os.path.join(output_dir, f"{dataset_name}_episode_{episode_num}.mcap")
+        start = time.perf_counter()
+        num_steps += convert_episode(
+            episode, output_file, dataset_name, control_rate_hz, schema_options=schema_options,
+            step_batch_size=step_batch_size, pipeline=pipeline
+        )
+        episode_time = time.perf_counter() - start
+
+        convert_time += episode_time
+        written += os.path.getsize(output_file)
+        stages["numpy"] += numpy_time
+        stages["serialize"] += max(0.0, in_memory_time - numpy_time)
+        stages["write"] += max(0.0, episode_time - in_memory_time)
+        read_start = time.perf_counter()
+
+    total = stages["load"] + convert_time
+    return {
+        "episodes": episodes,
+        "steps": num_steps,
+        "seconds": total,
+        "steps_per_sec": num_steps / total,
+        "mb_written": written / 1e6,
+        "mb_per_sec": written / 1e6 / convert_time,
+        "stage_seconds": stages,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_batch(dataset_name, data_root, output_dir, episodes, workers, schema_options, control_rate_hz,
+                step_batch_size, pipeline):
+    """Convert all episodes with `batch_convert_episodes`"""
+    start = time.perf_counter()
+    results = batch_convert_episodes(
+        dataset_name, 0, episodes - 1, output_dir,
+        workers=workers,
+        schema_options=schema_options,
+        control_rate_hz=control_rate_hz,
+        source_options={"data_root": data_root},
+        step_batch_size=step_batch_size,
+        pipeline=pipeline,
+    )
+    elapsed = time.perf_counter() - start
+
+    converted = [r for r in results if r["status"] == "converted"]
+    num_steps = sum(r["steps"] for r in converted)
+    written = sum(r["output_size"] for r in converted)
+    return {
+        "episodes": len(converted),
+        "workers": workers,
+        "steps": num_steps,
+        "seconds": elapsed,
+        "steps_per_sec": num_steps / elapsed,
+        "mb_written": written / 1e6,
+        "mb_per_sec": written / 1e6 / elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure conversion throughput on synthetic episodes")
+    parser.add_argument("--dataset", choices=sorted(LAYOUTS), default="berkeley_autolab_ur5",
+                        help="Dataset whose feature layout and schema are used")
+    parser.add_argument("--mode", choices=["episode", "batch", "all"], default="all",
+                        help="Benchmark convert_episode, batch_convert_episodes or both")
+    parser.add_argument("--episodes", type=int, default=4, help="Number of episodes")
+    parser.add_argument("--steps", type=int, default=50, help="Number of steps per episode")
+    parser.add_argument("--height", type=int, default=256, help="Image height in pixels")
+    parser.add_argument("--width", type=int, default=320, help="Image width in pixels")
+    parser.add_argument("--cameras", type=int, help="Number of RGB and of depth cameras (default: all of the layout)")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes in batch mode")
+    parser.add_argument("--rate", type=float, default=5.0, help="Control rate in Hz")
+    parser.add_argument("--step-batch-size", type=int, default=32, help="Number of steps processed at once")
+    parser.add_argument("--no-pipeline", action="store_true", help="Read, process and write steps on a single thread")
+    parser.add_argument("--image-codec", action="append", metavar="[TOPIC=]CODEC", help="Image codec, as for the CLI")
+    parser.add_argument("--message-encoding", choices=MESSAGE_ENCODINGS, default="json",
+                        help="Encoding of the gripper, joint state and language instruction channels")
+    parser.add_argument("--passthrough-images", action="store_true", help="Publish encoded images without decoding")
+    parser.add_argument("--depth-format", choices=DEPTH_FORMATS,
+                        help="Storage of floating point depth images, as for the CLI")
+    parser.add_argument("--image-preset", choices=sorted(IMAGE_PRESETS),
+                        help="Codec, resize and frame decimation of all image topics, as for the CLI")
+    parser.add_argument("--data-root", help="Directory for the synthetic dataset, reused if it exists (default: temporary)")
+    parser.add_argument("--json", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    schema_options = {
+        "image_passthrough": args.passthrough_images,
+        "message_encoding": args.message_encoding,
+        **apply_image_preset(args.image_preset, parse_image_codecs(args.image_codec), {}, args.depth_format),
+    }
+
+    with tempfile.TemporaryDirectory(prefix="conversion-benchmark-") as tmp_dir:
+        data_root = args.data_root or os.path.join(tmp_dir, "data")
+        start = time.perf_counter()
+        build_dataset(data_root, args.dataset, args.episodes, args.steps, args.height, args.width, args.cameras)
+        print(f"Synthetic dataset ready in {time.perf_counter() - start:.1f}s")
+
+        report = {
+            "benchmark": "conversion",
+            "config": vars(args),
+            "environment": {
+                "python": platform.python_version(),
+                "tensorflow": tf.__version__,
+                "foxglove": getattr(foxglove, "__version__", None),
+                "cpus": os.cpu_count(),
+            },
+        }
+        if args.mode in ("episode", "all"):
+            report["episode"] = bench_episode(
+                args.dataset, data_root, os.path.join(tmp_dir, "episode"), args.episodes, schema_options, args.rate,
+                args.step_batch_size, not args.no_pipeline
+            )
+        if args.mode in ("batch", "all"):
+            report["batch"] = bench_batch(
+                args.dataset, data_root, os.path.join(tmp_dir, "batch"), args.episodes, args.workers, schema_options,
+                args.rate, args.step_batch_size, not args.no_pipeline
+            )
+
+    for mode in ("episode", "batch"):
+        if mode in report:
+            r = report[mode]
+            print(f"{mode}: {r['steps']} steps in {r['seconds']:.2f}s, {r['steps_per_sec']:.1f} steps/s, "
+                  f"{r['mb_per_sec']:.1f} MB/s written, peak RSS {r['peak_rss_mb']['self']:.0f} MB "
+                  f"(workers {r['peak_rss_mb']['children']:.0f} MB)")
+            if "stage_seconds" in r:
+                print("  " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in r["stage_seconds"].items()))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
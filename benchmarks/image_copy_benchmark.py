@@ -0,0 +1,99 @@
+"""Benchmark the bytes copied when building RawImage messages from tensors."""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import tensorflow as tf
+from foxglove.schemas import RawImage
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from common.images import raw_image
+
+
+def make_step(height, width, num_cameras):
+    """Create the image tensors of one synthetic multi-camera step."""
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(num_cameras):
+        images.append((tf.constant(rng.integers(0, 255, (height, width, 3), dtype=np.uint8)), "rgb8", 3))
+        images.append((tf.constant(rng.random((height, width, 1), dtype=np.float32)), "32FC1", 4))
+    return images
+
+
+def legacy_raw_image(tensor, encoding, bytes_per_pixel):
+    """Build a RawImage the way the schemas did before `common.images`."""
+    return RawImage(
+        data=tensor.numpy().tobytes(),
+        width=tensor.shape[1],
+        height=tensor.shape[0],
+        step=tensor.shape[1] * bytes_per_pixel,
+        encoding=encoding,
+    )
+
+
+def measure(build, images, repeat):
+    """Measure bytes allocated per step and seconds per step for a builder.
+
+    Each image is measured on its own so the peak of traced allocations
+    equals the bytes copied for that image; the per-step figure is their sum.
+    """
+    copied = 0
+    tracemalloc.start()
+    for tensor, encoding, bytes_per_pixel in images:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        msg = build(tensor, encoding, bytes_per_pixel)
+        _, peak = tracemalloc.get_traced_memory()
+        copied += peak - baseline
+        del msg
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for tensor, encoding, bytes_per_pixel in images:
+            build(tensor, encoding, bytes_per_pixel)
+    elapsed = (time.perf_counter() - start) / repeat
+    return copied, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bytes copied per step when building RawImage messages")
+    parser.add_argument("--height", type=int, default=480, help="Image height in pixels")
+    parser.add_argument("--width", type=int, default=640, help="Image width in pixels")
+    parser.add_argument("--cameras", type=int, default=4, help="Number of RGB + depth camera pairs per step")
+    parser.add_argument("--repeat", type=int, default=50, help="Number of steps to time")
+    args = parser.parse_args()
+
+    images = make_step(args.height, args.width, args.cameras)
+    payload = sum(int(np.prod(t.shape)) * t.dtype.size for t, _, _ in images)
+    print(f"Step payload: {payload / 1e6:.2f} MB in {len(images)} images")
+
+    paths = {
+        "before (tensor.numpy().tobytes())": legacy_raw_image,
+        "after (common.images.raw_image)": lambda tensor, encoding, _: raw_image(tensor, encoding),
+    }
+    for name, build in paths.items():
+        copied, elapsed = measure(build, images, args.repeat)
+        print(f"{name}: {copied / 1e6:.2f} MB copied per step ({copied / payload:.1f}x payload), {elapsed * 1e3:.2f} ms per step")
+
+
+if __name__ == "__main__":
+    main()
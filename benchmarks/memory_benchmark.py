@@ -0,0 +1,141 @@
+"""Check that peak memory stays flat as episodes get longer when converting with a memory limit."""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from synthetic import LAYOUTS, build_dataset
+from conversion_benchmark import peak_rss_mb
+from open_x_embodiment.cache import parse_size
+
+
+def own_peak_rss_mb():
+    """Get the peak RSS of this process in MB.
+
+    Linux keeps the peak of `getrusage` across `exec`, so a child started
+    by a large parent would report the parent's peak; the high-water mark
+    in /proc is reset by `exec` and is used when available.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024 / 1e6
+    except OSError:
+        pass
+    return peak_rss_mb()["self"]
+
+
+def convert_child(args):
+    """Convert the first episode of a dataset and print the peak RSS of this process as JSON
+
+    The peak RSS after reading the episode, before converting it, is
+    reported separately: TFDS reads and parses the whole episode record at
+    once, which the memory limit does not cover.
+    """
+    from open_x_embodiment.converter import convert_episode
+    from open_x_embodiment.data_loader import load_builder, iter_episodes
+
+    builder = load_builder(args.dataset, 0, 0, data_root=args.data_root)
+    memory_limit = parse_size(args.memory_limit) if args.memory_limit else None
+    for _, episode in iter_episodes(builder, 0, 0, prefetch=0):
+        read_peak_rss_mb = own_peak_rss_mb()
+        steps = convert_episode(
+            episode, os.path.join(args.output_dir, "episode.mcap"), args.dataset, memory_limit=memory_limit
+        )
+    print(json.dumps({"steps": steps, "read_peak_rss_mb": read_peak_rss_mb, "peak_rss_mb": own_peak_rss_mb()}))
+
+
+def measure(dataset_name, data_root, output_dir, memory_limit):
+    """Convert an episode in a fresh process, so that its peak RSS is its own"""
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--dataset", dataset_name,
+               "--data-root", data_root, "--output-dir", output_dir]
+    if memory_limit:
+        command += ["--memory-limit", memory_limit]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def record_mb(data_root, dataset_name):
+    """Get the size of a dataset's TFRecord files in MB, which TFDS reads one whole episode at a time"""
+    pattern = os.path.join(data_root, dataset_name, "*", "*.tfrecord*")
+    return sum(os.path.getsize(path) for path in glob.glob(pattern)) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert episodes of growing length with a memory limit and check that peak RSS stays flat"
+    )
+    parser.add_argument("--dataset", choices=sorted(LAYOUTS), default="stanford_robocook_converted_externally_to_rlds",
+                        help="Dataset whose feature layout and schema are used")
+    parser.add_argument("--steps", type=int, nargs="+", default=[50, 200, 800], help="Episode lengths to convert")
+    parser.add_argument("--height", type=int, default=256, help="Image height in pixels")
+    parser.add_argument("--width", type=int, default=320, help="Image width in pixels")
+    parser.add_argument("--cameras", type=int, help="Number of RGB and of depth cameras (default: all of the layout)")
+    parser.add_argument("--memory-limit", default="256M", help="Memory limit passed to convert_episode")
+    parser.add_argument("--unbounded", action="store_true", help="Also convert every episode without a memory limit")
+    parser.add_argument("--tolerance-mb", type=float, default=64.0,
+                        help="Allowed growth of the memory conversion adds on top of reading the episode, "
+                             "from the shortest to the longest episode")
+    parser.add_argument("--data-root", help="Directory for the synthetic datasets, reused if they exist "
+                                            "(default: temporary)")
+    parser.add_argument("--json", help="Write the report to this JSON file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--output-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        convert_child(args)
+        return
+
+    report = {"benchmark": "memory", "config": vars(args), "results": []}
+    with tempfile.TemporaryDirectory(prefix="memory-benchmark-") as tmp_dir:
+        for num_steps in sorted(args.steps):
+            data_root = os.path.join(args.data_root or tmp_dir, f"steps_{num_steps}")
+            build_dataset(data_root, args.dataset, 1, num_steps, args.height, args.width, args.cameras)
+            result = {"steps": num_steps, "record_mb": record_mb(data_root, args.dataset)}
+            result.update(measure(args.dataset, data_root, tmp_dir, args.memory_limit))
+            result["conversion_mb"] = max(0.0, result["peak_rss_mb"] - result["read_peak_rss_mb"])
+            if args.unbounded:
+                result["unbounded_peak_rss_mb"] = measure(args.dataset, data_root, tmp_dir, None)["peak_rss_mb"]
+            report["results"].append(result)
+            print(f"{num_steps} steps: peak RSS {result['peak_rss_mb']:.0f} MB"
+                  + (f" ({result['unbounded_peak_rss_mb']:.0f} MB without limit)" if args.unbounded else "")
+                  + f", {result['read_peak_rss_mb']:.0f} MB after reading the {result['record_mb']:.0f} MB "
+                    f"episode record, conversion adds {result['conversion_mb']:.0f} MB")
+
+    shortest, longest = report["results"][0], report["results"][-1]
+    growth = longest["conversion_mb"] - shortest["conversion_mb"]
+    report["conversion_growth_mb"] = growth
+    report["flat"] = growth <= args.tolerance_mb
+    print(f"Memory added by conversion grew by {growth:.0f} MB from {shortest['steps']} to {longest['steps']} steps "
+          f"(allowed: {args.tolerance_mb:.0f} MB): {'flat' if report['flat'] else 'NOT FLAT'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+    sys.exit(0 if report["flat"] else 1)
+
+
+if __name__ == "__main__":
+    main()
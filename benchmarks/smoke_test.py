@@ -0,0 +1,173 @@
+"""Smoke test of conversion options on a short synthetic episode."""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import collections
+import os
+import sys
+import tempfile
+import traceback
+
+# From the "benchmarks" extra, as the foxglove SDK writes MCAP files but cannot read them
+from mcap.reader import make_reader
+
+import foxglove
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from synthetic import LAYOUTS, build_dataset
+from common.images import ImagePublisher
+from common.profiling import Profiler
+from open_x_embodiment.converter import convert_episode
+from open_x_embodiment.data_loader import load_builder, iter_episodes
+
+
+def first_episode(dataset_name, data_root):
+    """Read the first episode of a dataset"""
+    builder = load_builder(dataset_name, 0, 0, data_root=data_root)
+    for _, episode in iter_episodes(builder, 0, 0, prefetch=0):
+        return episode
+
+
+def convert(dataset_name, data_root, output_file, step_iterator=False, **options):
+    """Convert the first episode of a dataset with `convert_episode` options
+
+    Args:
+        step_iterator: Pass the steps as a Python iterator instead of a dataset
+
+    Returns:
+        int: Number of converted steps
+    """
+    episode = first_episode(dataset_name, data_root)
+    if step_iterator:
+        episode = {"steps": iter(list(episode["steps"]))}
+    return convert_episode(episode, output_file, dataset_name, **options)
+
+
+def read_messages(path):
+    """Read the log times and data of the messages of every topic of an MCAP file"""
+    messages = collections.defaultdict(list)
+    with open(path, "rb") as f:
+        for _, channel, message in make_reader(f).iter_messages(log_time_order=False):
+            messages[channel.topic].append((message.log_time, message.data))
+    return dict(messages)
+
+
+def assert_same_messages(expected, actual):
+    """Check that two files hold the same messages on every topic, in the same order"""
+    assert expected.keys() == actual.keys(), f"topics differ: {sorted(expected)} and {sorted(actual)}"
+    differing = [topic for topic in expected if expected[topic] != actual[topic]]
+    assert not differing, f"messages differ on {', '.join(sorted(differing))}"
+
+
+def check_live_preview(dataset_name, data_root, output_dir, num_steps):
+    """Live preview with the default pipeline, with and without profiling"""
+    for profiler in (None, Profiler()):
+        output_file = os.path.join(output_dir, "live.mcap")
+        steps = convert(dataset_name, data_root, output_file, live_preview=True, profiler=profiler)
+        assert steps == num_steps, f"converted {steps} of {num_steps} steps"
+        assert os.path.exists(output_file), "no MCAP file written"
+
+
+def check_memory_limit(dataset_name, data_root, output_dir, num_steps):
+    """A memory limit changes how steps are buffered, not the messages"""
+    for step_iterator in (False, True):
+        outputs = []
+        for memory_limit in (None, 1_000_000):
+            output_file = os.path.join(output_dir, f"memory_{len(outputs)}.mcap")
+            steps = convert(dataset_name, data_root, output_file, step_iterator, memory_limit=memory_limit)
+            assert steps == num_steps, f"converted {steps} of {num_steps} steps with a memory limit of {memory_limit}"
+            outputs.append(read_messages(output_file))
+        assert_same_messages(*outputs)
+
+
+def check_every_nth_step(dataset_name, data_root, output_dir, num_steps):
+    """Decimated steps keep the messages and log times they have in the full episode, with a memory limit too"""
+    full_file = os.path.join(output_dir, "every_step.mcap")
+    convert(dataset_name, data_root, full_file)
+    full = read_messages(full_file)
+    for step_iterator in (False, True):
+        output_file = os.path.join(output_dir, "every_2nd_step.mcap")
+        steps = convert(dataset_name, data_root, output_file, step_iterator, every_nth_step=2, memory_limit=1_000_000)
+        assert steps == (num_steps + 1) // 2, f"converted {steps} of {(num_steps + 1) // 2} steps"
+        decimated = read_messages(output_file)
+        # Latched topics publish only on change, so compare topics with a message per step
+        per_step = [topic for topic, messages in full.items() if len(messages) == num_steps]
+        assert per_step, "no topic with a message per step"
+        assert_same_messages({topic: full[topic][::2] for topic in per_step},
+                             {topic: decimated[topic] for topic in per_step})
+
+
+def check_failed_encode(dataset_name, data_root, output_dir, num_steps):
+    """An image that fails to encode is skipped without losing the images queued behind it"""
+    output_file = os.path.join(output_dir, "failed_encode.mcap")
+    writer = foxglove.open_mcap(output_file, allow_overwrite=True)
+    images = ImagePublisher(codecs={"*": "jpeg"}, max_pending=num_steps * 2)
+    try:
+        channels = [images.channel("/failing"), images.channel("/image")]
+        for step in range(num_steps):
+            # JPEG has no two-channel images, so the first one fails on its encoder thread
+            failing = np.zeros((64, 80, 2 if step == 0 else 3), np.uint8)
+            images.publish(channels[0], failing, "rgb8", step)
+            images.publish(channels[1], np.zeros((64, 80, 3), np.uint8), "rgb8", step)
+        images.flush()
+    finally:
+        images.close()
+        writer.close()
+    messages = read_messages(output_file)
+    assert [log_time for log_time, _ in messages["/failing"]] == list(range(1, num_steps)), "wrong /failing frames"
+    assert [log_time for log_time, _ in messages["/image"]] == list(range(num_steps)), "lost /image frames"
+
+
+CHECKS = {
+    "live_preview": check_live_preview,
+    "memory_limit": check_memory_limit,
+    "every_nth_step": check_every_nth_step,
+    "failed_encode": check_failed_encode,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a short synthetic episode with various options")
+    parser.add_argument("--dataset", choices=sorted(LAYOUTS), default="berkeley_autolab_ur5",
+                        help="Dataset whose feature layout and schema are used")
+    parser.add_argument("--steps", type=int, default=10, help="Number of steps of the episode")
+    parser.add_argument("--check", choices=sorted(CHECKS), action="append",
+                        help="Check to run, can be repeated (default: all)")
+    parser.add_argument("--data-root", help="Directory for the synthetic dataset, reused if it exists "
+                                            "(default: temporary)")
+    args = parser.parse_args()
+
+    checks = args.check or list(CHECKS)
+    failed = []
+    with tempfile.TemporaryDirectory(prefix="smoke-test-") as tmp_dir:
+        data_root = args.data_root or os.path.join(tmp_dir, "data")
+        build_dataset(data_root, args.dataset, 1, args.steps, 64, 80)
+        for name in checks:
+            try:
+                CHECKS[name](args.dataset, data_root, tmp_dir, args.steps)
+                print(f"{name}: ok")
+            except Exception:
+                traceback.print_exc()
+                print(f"{name}: FAILED")
+                failed.append(name)
+
+    print(f"{len(checks) - len(failed)} of {len(checks)} checks passed")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Check that CLI commands which read no dataset start quickly and never import TensorFlow."""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CLI = os.path.join(ROOT, "cli.py")
+
+# Command lines timed by default; none of them reads a dataset
+DEFAULT_COMMANDS = [
+    "--help",
+    "convert --help",
+    "list-schemas",
+    "--dataset unknown_dataset",
+    "merge-manifests --output-dir {tmp_dir}",
+]
+
+# Modules that must not be imported by these commands
+HEAVY_MODULES = ("tensorflow", "tensorflow_datasets")
+
+
+def run_child(cli_args):
+    """Run the CLI in this process and print the heavy modules it imported as JSON"""
+    sys.path.insert(0, ROOT)
+    import cli
+
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        try:
+            cli.main(cli_args)
+        except SystemExit:
+            pass
+    print(json.dumps({"imported": [name for name in HEAVY_MODULES if name in sys.modules]}))
+
+
+def time_command(cli_args, repeat):
+    """Time a command line in fresh interpreters, including interpreter startup
+
+    Returns:
+        list: Wall time of each run in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, CLI] + cli_args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def imported_modules(cli_args):
+    """Get the heavy modules a command line imports"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--"] + cli_args,
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])["imported"]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time CLI commands that read no dataset and check that they don't import TensorFlow"
+    )
+    parser.add_argument("--command", action="append", metavar="ARGS",
+                        help="CLI arguments to time, e.g. 'list-schemas'; may be repeated "
+                             f"(default: {' | '.join(DEFAULT_COMMANDS)})")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs per command; the median is reported")
+    parser.add_argument("--budget-seconds", type=float, default=1.0,
+                        help="Maximum median wall time of each command, including interpreter startup")
+    parser.add_argument("--json", help="Write the report to this JSON file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("cli_args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.cli_args[1:] if args.cli_args[:1] == ["--"] else args.cli_args)
+        return
+
+    report = {"benchmark": "startup", "config": vars(args), "results": {}}
+    with tempfile.TemporaryDirectory(prefix="startup-benchmark-") as tmp_dir:
+        for command in args.command or DEFAULT_COMMANDS:
+            cli_args = command.format(tmp_dir=tmp_dir).split()
+            times = time_command(cli_args, args.repeat)
+            imported = imported_modules(cli_args)
+            median = statistics.median(times)
+            report["results"][command] = {
+                "median_seconds": median,
+                "min_seconds": min(times),
+                "imported": imported,
+                "ok": median <= args.budget_seconds and not imported,
+            }
+            print(f"{command:<40}{median:>8.3f} s"
+                  + (f"  imports {', '.join(imported)}" if imported else "")
+                  + ("" if report["results"][command]["ok"] else "  FAILED"))
+
+    report["ok"] = all(result["ok"] for result in report["results"].values())
+    print(f"All commands within {args.budget_seconds:.2f} s without TensorFlow: {'yes' if report['ok'] else 'NO'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Synthetic Open-X-Embodiment datasets for offline benchmarks."""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+
+import numpy as np
+import tensorflow_datasets as tfds
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from open_x_embodiment.data_loader import dataset2path
+
+# Feature layouts of the datasets with dedicated schemas
+LAYOUTS = {
+    "berkeley_autolab_ur5": {
+        "rgb": ["image", "hand_image"],
+        "depth": ["image_with_depth"],
+        "state": "robot_state",
+        "state_size": 15,
+        "instruction": ("observation", "natural_language_instruction"),
+    },
+    "stanford_robocook_converted_externally_to_rlds": {
+        "rgb": ["image_1", "image_2", "image_3", "image_4"],
+        "depth": ["depth_1", "depth_2", "depth_3", "depth_4"],
+        "state": "state",
+        "state_size": 7,
+        "instruction": ("step", "language_instruction"),
+    },
+}
+
+
+def camera_keys(dataset_name, cameras=None):
+    """Get the RGB and depth image keys of a layout, limited to `cameras` of each"""
+    layout = LAYOUTS[dataset_name]
+    return layout["rgb"][:cameras], layout["depth"][:cameras]
+
+
+def step_features(dataset_name, height, width, cameras=None):
+    """Build the TFDS features of one step of a layout"""
+    layout = LAYOUTS[dataset_name]
+    rgb_keys, depth_keys = camera_keys(dataset_name, cameras)
+    observation = {key: tfds.features.Image(shape=(height, width, 3), encoding_format="jpeg") for key in rgb_keys}
+    observation.update(
+        {key: tfds.features.Tensor(shape=(height, width, 1), dtype=np.float32) for key in depth_keys}
+    )
+    observation[layout["state"]] = tfds.features.Tensor(shape=(layout["state_size"],), dtype=np.float32)
+
+    step = {
+        "action": tfds.features.Tensor(shape=(7,), dtype=np.float32),
+        "reward": tfds.features.Scalar(dtype=np.float32),
+        "is_first": np.bool_,
+        "is_last": np.bool_,
+    }
+    level, key = layout["instruction"]
+    if level == "observation":
+        observation[key] = tfds.features.Text()
+    else:
+        step[key] = tfds.features.Text()
+    step["observation"] = tfds.features.FeaturesDict(observation)
+    return tfds.features.FeaturesDict(step)
+
+
+def make_step(dataset_name, rng, step_idx, num_steps, height, width, cameras=None, episode_idx=0):
+    """Create the NumPy data of one synthetic step.
+
+    Images are smooth gradients with a little noise, so that they compress
+    about as well as camera images rather than like white noise.
+    """
+    layout = LAYOUTS[dataset_name]
+    rgb_keys, depth_keys = camera_keys(dataset_name, cameras)
+    ramp = np.add.outer(np.linspace(0, 1, height), np.linspace(0, 1, width)) / 2
+
+    observation = {}
+    for i, key in enumerate(rgb_keys):
+        shift = (step_idx + i * 10) / max(1, num_steps)
+        pattern = np.stack([(ramp + shift) % 1, ramp, 1 - ramp], axis=-1) * 240
+        noise = rng.integers(0, 16, (height, width, 3))
+        observation[key] = (pattern + noise).astype(np.uint8)
+    for key in depth_keys:
+        observation[key] = (0.5 + ramp + rng.random((height, width)) * 0.01).astype(np.float32)[:, :, np.newaxis]
+    observation[layout["state"]] = rng.random(layout["state_size"], dtype=np.float32)
+
+    step = {
+        "action": rng.random(7, dtype=np.float32),
+        "reward": np.float32(step_idx == num_steps - 1),
+        "is_first": step_idx == 0,
+        "is_last": step_idx == num_steps - 1,
+    }
+    level, key = layout["instruction"]
+    instruction = f"synthetic task {episode_idx}"
+    if level == "observation":
+        observation[key] = instruction
+    else:
+        step[key] = instruction
+    step["observation"] = observation
+    return step
+
+
+def build_dataset(data_root, dataset_name, episodes=4, steps=50, height=256, width=320, cameras=None, num_shards=None,
+                  seed=0):
+    """Write a synthetic TFDS dataset with the feature layout of a real one.
+
+    The dataset is written to `<data_root>/<dataset>/<version>`, the layout
+    `load_builder` reads with a local data root. An existing dataset is
+    reused as is.
+
+    Args:
+        data_root: Directory to write the dataset to
+        dataset_name: Name of a dataset in `LAYOUTS`
+        episodes: Number of episodes
+        steps: Number of steps per episode
+        height: Image height in pixels
+        width: Image width in pixels
+        cameras: Number of RGB and of depth cameras, None for all cameras of the layout
+        num_shards: Number of TFRecord shards, None to let TFDS decide
+        seed: Seed of the random data
+
+    Returns:
+        str: Directory of the dataset
+    """
+    builder_dir = dataset2path(dataset_name, data_root)
+    if os.path.exists(os.path.join(builder_dir, "dataset_info.json")):
+        return builder_dir
+
+    version = os.path.basename(builder_dir)
+    features = step_features(dataset_name, height, width, cameras)
+
+    class SyntheticDataset(tfds.core.GeneratorBasedBuilder, skip_registration=True):
+        name = dataset_name
+        VERSION = tfds.core.Version(version)
+
+        def _info(self):
+            return tfds.core.DatasetInfo(
+                builder=self,
+                features=tfds.features.FeaturesDict({"steps": tfds.features.Dataset(features)}),
+            )
+
+        def _split_generators(self, dl_manager):
+            return {"train": self._generate_examples()}
+
+        def _generate_examples(self):
+            rng = np.random.default_rng(seed)
+            for e in range(episodes):
+                yield e, {
+                    "steps": [
+                        make_step(dataset_name, rng, s, steps, height, width, cameras, episode_idx=e)
+                        for s in range(steps)
+                    ]
+                }
+
+    builder = SyntheticDataset(data_dir=data_root)
+    builder.download_and_prepare(download_config=tfds.download.DownloadConfig(num_shards=num_shards))
+    return builder_dir
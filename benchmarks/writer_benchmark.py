@@ -0,0 +1,177 @@
+"""Benchmark the file size and write throughput of MCAP writer settings on synthetic episodes."""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# From the "benchmarks" extra, as the foxglove SDK writes MCAP files but cannot read them
+from mcap.reader import make_reader
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from synthetic import LAYOUTS, build_dataset
+from conversion_benchmark import materialize
+from common.images import DEPTH_FORMATS, parse_image_codecs
+from open_x_embodiment.cache import parse_size
+from open_x_embodiment.converter import convert_episode
+from open_x_embodiment.data_loader import load_builder, iter_episodes
+from open_x_embodiment.writer_options import WRITER_PRESETS, resolve_writer_options
+
+# Writer settings compared by default, as NAME=OPTIONS with OPTIONS a
+# comma-separated list of preset names and KEY=VALUE writer options
+DEFAULT_CONFIGS = [
+    "default=",
+    "uncompressed=compression=none",
+    "lz4=compression=lz4",
+    "zstd-9=compression_level=9",
+    "fast=fast",
+    "archive=archive",
+    "no-index=message_indexes=false",
+]
+
+
+def parse_config(spec):
+    """Parse a writer configuration such as `big-lz4=fast,chunk_size=32M`
+
+    Returns:
+        tuple: Name and writer options
+    """
+    name, _, spec = spec.partition("=")
+    preset = None
+    options = {}
+    for item in filter(None, spec.split(",")):
+        key, sep, value = item.partition("=")
+        if not sep:
+            if key not in WRITER_PRESETS:
+                raise ValueError(f"Unknown writer preset '{key}'")
+            preset = key
+        elif key == "chunk_size":
+            options[key] = parse_size(value)
+        elif key == "compression_level":
+            options[key] = int(value)
+        elif key == "message_indexes":
+            options[key] = value.lower() in ("1", "true", "yes")
+        else:
+            options[key] = value
+    return name, resolve_writer_options(preset, **options)
+
+
+def read_time(path):
+    """Time reading all messages of an MCAP file, and seeking to its last second"""
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        reader = make_reader(f)
+        end_time = 0
+        for _, _, message in reader.iter_messages(log_time_order=False):
+            end_time = max(end_time, message.log_time)
+    read_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        for _ in make_reader(f).iter_messages(start_time=max(0, end_time - 10**9)):
+            pass
+    return read_seconds, time.perf_counter() - start
+
+
+def bench_config(episodes, dataset_name, output_dir, writer_options, schema_options, control_rate_hz):
+    """Convert in-memory episodes with one writer configuration"""
+    convert_time = 0.0
+    read_seconds = 0.0
+    seek_seconds = 0.0
+    num_steps = 0
+    written = 0
+    for episode_num, episode in episodes:
+        output_file = os.path.join(output_dir, f"{dataset_name}_episode_{episode_num}.mcap")
+        start = time.perf_counter()
+        num_steps += convert_episode(
+            episode, output_file, dataset_name, control_rate_hz, schema_options=schema_options,
+            writer_options=writer_options
+        )
+        convert_time += time.perf_counter() - start
+        written += os.path.getsize(output_file)
+        read, seek = read_time(output_file)
+        read_seconds += read
+        seek_seconds += seek
+        os.remove(output_file)
+    return {
+        "writer_options": writer_options,
+        "steps": num_steps,
+        "seconds": convert_time,
+        "steps_per_sec": num_steps / convert_time,
+        "mb_written": written / 1e6,
+        "mb_per_sec": written / 1e6 / convert_time,
+        "read_seconds": read_seconds,
+        "seek_seconds": seek_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare file size and write throughput of MCAP writer settings")
+    parser.add_argument("--dataset", choices=sorted(LAYOUTS), default="berkeley_autolab_ur5",
+                        help="Dataset whose feature layout and schema are used")
+    parser.add_argument("--episodes", type=int, default=2, help="Number of episodes")
+    parser.add_argument("--steps", type=int, default=100, help="Number of steps per episode")
+    parser.add_argument("--height", type=int, default=256, help="Image height in pixels")
+    parser.add_argument("--width", type=int, default=320, help="Image width in pixels")
+    parser.add_argument("--cameras", type=int, help="Number of RGB and of depth cameras (default: all of the layout)")
+    parser.add_argument("--rate", type=float, default=5.0, help="Control rate in Hz")
+    parser.add_argument("--image-codec", action="append", metavar="[TOPIC=]CODEC", help="Image codec, as for the CLI")
+    parser.add_argument("--depth-format", choices=DEPTH_FORMATS, default="32FC1",
+                        help="Storage of floating point depth images, as for the CLI")
+    parser.add_argument("--config", action="append", metavar="NAME=OPTIONS",
+                        help="Writer configuration, e.g. big-lz4=fast,chunk_size=32M; may be repeated "
+                             f"(default: {' '.join(DEFAULT_CONFIGS)})")
+    parser.add_argument("--data-root", help="Directory for the synthetic dataset, reused if it exists (default: temporary)")
+    parser.add_argument("--json", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        configs = [parse_config(spec) for spec in args.config or DEFAULT_CONFIGS]
+    except ValueError as e:
+        parser.error(str(e))
+    schema_options = {"image_codecs": parse_image_codecs(args.image_codec), "depth_format": args.depth_format}
+
+    report = {"benchmark": "writer", "config": vars(args), "results": {}}
+    with tempfile.TemporaryDirectory(prefix="writer-benchmark-") as tmp_dir:
+        data_root = args.data_root or os.path.join(tmp_dir, "data")
+        build_dataset(data_root, args.dataset, args.episodes, args.steps, args.height, args.width, args.cameras)
+
+        # Read the episodes once, so that only conversion and writing are timed
+        builder = load_builder(args.dataset, 0, args.episodes - 1, data_root=data_root)
+        episodes = [(episode_num, materialize(episode))
+                    for episode_num, episode in iter_episodes(builder, 0, args.episodes - 1)]
+
+        for name, writer_options in configs:
+            report["results"][name] = bench_config(
+                episodes, args.dataset, os.path.join(tmp_dir, "output"), writer_options, schema_options, args.rate
+            )
+
+    print(f"{'config':<16}{'MB':>10}{'steps/s':>10}{'MB/s':>10}{'read s':>10}{'seek s':>10}")
+    for name, r in report["results"].items():
+        print(f"{name:<16}{r['mb_written']:>10.2f}{r['steps_per_sec']:>10.1f}{r['mb_per_sec']:>10.1f}"
+              f"{r['read_seconds']:>10.3f}{r['seek_seconds']:>10.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,14 +15,40 @@
 
 import argparse
 import os
-from open_x_embodiment.data_loader import load_dataset
-from open_x_embodiment.converter import convert_episode, batch_convert_episodes
+import sys
+from common.images import DEPTH_FORMATS, IMAGE_CODECS, IMAGE_PRESETS
+from common.messages import MESSAGE_ENCODINGS
+from open_x_embodiment.writer_options import MCAP_COMPRESSIONS
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Convert Open-X-Embodiment datasets to MCAP format for visualization in coScene",
-        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+# Subcommands; arguments that don't start with one are those of `convert`.
+# Only `convert` imports TensorFlow, and only once its arguments are valid,
+# so that help, listing schemas and merging manifests start instantly.
+COMMANDS = ("convert", "index", "merge-manifests", "list-schemas")
+
+
+def add_source_arguments(parser):
+    """Add the arguments locating the dataset to read to a parser"""
+    parser.add_argument(
+        "--data-root", 
+        help="Local directory to read datasets from (<data-root>/<dataset>/<version>) instead of GCS"
+    )
+    parser.add_argument(
+        "--cache-dir", 
+        help="Directory of a local dataset cache; remote shards are downloaded once and reused by later runs"
+    )
+    parser.add_argument(
+        "--cache-size", 
+        help="Maximum size of the dataset cache, e.g. 50G; least recently used files are evicted beyond it"
     )
+    parser.add_argument(
+        "--offline", 
+        action="store_true", 
+        help="Never access the network; only read cached or local data"
+    )
+
+
+def add_convert_arguments(parser):
+    """Add the arguments of the `convert` command to a parser"""
     parser.add_argument(
         "--dataset", 
         default="berkeley_autolab_ur5", 
@@ -51,46 +77,495 @@ def main():
         default=10, 
         help="End episode number (for batch mode)"
     )
+    parser.add_argument(
+        "--workers", 
+        type=int, 
+        default=1, 
+        help="Number of worker processes (for batch mode)"
+    )
+    parser.add_argument(
+        "--num-shards", 
+        type=int, 
+        help="Split all episodes of the dataset into this many shards of similar estimated size and convert the one "
+             "given by --shard-index, instead of --start to --end; every shard writes its own manifest fragment"
+    )
+    parser.add_argument(
+        "--shard-index", 
+        type=int, 
+        default=0, 
+        help="Index of the shard to convert, from 0 to --num-shards - 1"
+    )
+    parser.add_argument(
+        "--resume", 
+        action="store_true", 
+        help="Skip episodes that the manifest in the output directory lists as converted, and retry failed ones (for batch mode)"
+    )
     parser.add_argument(
         "--output-dir", 
         default="mcap_files", 
         help="Output directory for generated MCAP files"
     )
+    add_source_arguments(parser)
+    parser.add_argument(
+        "--index", 
+        metavar="PATH", 
+        help="Episode index written by the index command; batch and shard conversions balance their work by the "
+             "indexed episode sizes"
+    )
+    parser.add_argument(
+        "--min-steps", 
+        type=int, 
+        metavar="N", 
+        help="Skip episodes with fewer steps, e.g. 1 to skip empty episodes, as listed in --index"
+    )
+    parser.add_argument(
+        "--max-steps", 
+        type=int, 
+        metavar="N", 
+        help="Skip episodes with more steps, as listed in --index"
+    )
     parser.add_argument(
         "--live", 
         action="store_true", 
-        help="Show live preview during conversion"
+        help="Replay the episode to a live viewer while converting it to MCAP"
+    )
+    parser.add_argument(
+        "--live-buffer-size", 
+        type=int, 
+        default=1024, 
+        help="Maximum number of messages buffered for the live preview; the oldest are dropped when the viewer falls behind"
     )
     parser.add_argument(
         "--rate", 
         type=float, 
         default=5.0, 
-        help="Playback rate in Hz for live preview"
+        help="Control rate in Hz, used to timestamp steps and to pace the live preview"
+    )
+    parser.add_argument(
+        "--start-time", 
+        type=float, 
+        default=0.0, 
+        help="Log time of the first step of each episode, in seconds since the Unix epoch"
+    )
+    parser.add_argument(
+        "--step-batch-size", 
+        type=int, 
+        default=32, 
+        help="Number of steps read and processed at once; 1 processes steps one by one"
+    )
+    parser.add_argument(
+        "--memory-limit", 
+        help="Memory ceiling of the steps and messages buffered while converting an episode, e.g. 2G, per worker; "
+             "batch and queue sizes are derived from it, so memory stays flat however long episodes are"
+    )
+    parser.add_argument(
+        "--no-pipeline", 
+        action="store_true", 
+        help="Read, process and write steps one after another on a single thread instead of overlapping them"
+    )
+    parser.add_argument(
+        "--image-codec", 
+        action="append", 
+        metavar="[TOPIC=]CODEC", 
+        help=f"Image codec ({', '.join(IMAGE_CODECS)}) for all image topics, or for one topic as TOPIC=CODEC; "
+             "may be repeated. Depth images are always stored as lossless 16-bit PNG when compressed"
+    )
+    parser.add_argument(
+        "--image-resize", 
+        action="append", 
+        metavar="[TOPIC=]SIZE", 
+        help="Resize the images of all image topics, or of one topic as TOPIC=SIZE, by a scale factor such as 0.5 "
+             "or to WIDTHxHEIGHT; may be repeated"
+    )
+    parser.add_argument(
+        "--image-crop", 
+        action="append", 
+        metavar="[TOPIC=]X,Y,W,H", 
+        help="Crop the images of all image topics, or of one topic, to a region of interest in pixels, "
+             "before resizing them; may be repeated"
+    )
+    parser.add_argument(
+        "--image-every-nth", 
+        action="append", 
+        metavar="[TOPIC=]N", 
+        help="Keep only every N-th frame of all image topics, or of one topic; may be repeated"
+    )
+    parser.add_argument(
+        "--image-preset", 
+        choices=sorted(IMAGE_PRESETS), 
+        help="Codec, resize and frame decimation of all image topics for lightweight exports: preview is JPEG, with "
+             "16UC1 depth, at half resolution and half the frame rate, thumbnail the same at a quarter of the "
+             "resolution and a fifth of the frame rate. --image-* and --depth-format options override single settings"
+    )
+    parser.add_argument(
+        "--passthrough-images", 
+        action="store_true", 
+        help="Publish images with their original encoded (e.g. JPEG) bytes from the dataset, without decoding"
+    )
+    parser.add_argument(
+        "--jpeg-quality", 
+        type=int, 
+        default=90, 
+        help="JPEG quality for image topics using the jpeg codec"
+    )
+    parser.add_argument(
+        "--depth-format", 
+        choices=DEPTH_FORMATS, 
+        help="Storage of floating point depth images: as they are (32FC1, unless set by an image preset), quantized "
+             "to 16-bit integers (16UC1), or quantized and compressed as lossless 16-bit PNG (png). 16UC1 depth "
+             "topics stay raw unless --image-codec names them. Quantized depth channels carry their scale and range "
+             "as metadata"
+    )
+    parser.add_argument(
+        "--depth-scale", 
+        type=float, 
+        default=1000.0, 
+        help="Number of 16-bit steps per metre of quantized depth images; 1000 stores millimetres up to 65.5 m"
+    )
+    parser.add_argument(
+        "--message-encoding", 
+        choices=MESSAGE_ENCODINGS, 
+        default="json", 
+        help="Encoding of the gripper, joint state and language instruction channels; "
+             "protobuf is smaller and faster to write"
+    )
+    parser.add_argument(
+        "--repeat-latched", 
+        action="store_true", 
+        help="Publish latched channels, such as language instructions, on every step instead of only when they change"
+    )
+    parser.add_argument(
+        "--topics", 
+        action="append", 
+        metavar="TOPIC", 
+        help="Convert only this topic, e.g. /joint_state, or the topics matching a glob such as '/image*'; may be "
+             "repeated. Step features used only by other topics, such as their images, are not decoded"
+    )
+    parser.add_argument(
+        "--exclude-topics", 
+        action="append", 
+        metavar="TOPIC", 
+        help="Don't convert this topic or the topics matching a glob; may be repeated"
+    )
+    parser.add_argument(
+        "--every-nth-step", 
+        type=int, 
+        default=1, 
+        metavar="N", 
+        help="Convert only every N-th step of each episode, at its original log time"
+    )
+    parser.add_argument(
+        "--mcap-compression", 
+        choices=MCAP_COMPRESSIONS, 
+        help="Chunk compression of the MCAP files; zstd unless set by a preset"
+    )
+    parser.add_argument(
+        "--mcap-compression-level", 
+        type=int, 
+        metavar="LEVEL", 
+        help="Chunk compression level; 0 (the compressor's default) unless set by a preset"
+    )
+    parser.add_argument(
+        "--mcap-chunk-size", 
+        metavar="SIZE", 
+        help="Target uncompressed size of MCAP chunks, e.g. 4M; larger chunks compress better and write faster, "
+             "smaller ones load faster when seeking. The writer's default unless set by a preset"
+    )
+    parser.add_argument(
+        "--no-mcap-index", 
+        action="store_true", 
+        help="Don't write message and chunk indexes; files get slightly smaller, but viewers must scan them to seek"
+    )
+    writer_presets = parser.add_mutually_exclusive_group()
+    writer_presets.add_argument(
+        "--profile-archive", 
+        dest="writer_preset", 
+        action="store_const", 
+        const="archive", 
+        help="Writer preset for the smallest files: zstd at level 19 in 8 MiB chunks; "
+             "--mcap-* options override single settings"
+    )
+    writer_presets.add_argument(
+        "--profile-fast", 
+        dest="writer_preset", 
+        action="store_const", 
+        const="fast", 
+        help="Writer preset for the fastest writes: lz4 in 16 MiB chunks; --mcap-* options override single settings"
+    )
+    parser.add_argument(
+        "--profile", 
+        metavar="PATH", 
+        help="Write per-stage times and per-topic message counts and bytes to PATH as JSON, "
+             "and as collapsed stacks for flame graphs next to it (.folded)"
     )
     parser.add_argument(
         "--verbose", 
         action="store_true", 
         help="Enable verbose output with step information"
     )
+
+
+def build_parser():
+    """Build the parser of the command line and its subcommands"""
+    parser = argparse.ArgumentParser(
+        description="Convert Open-X-Embodiment datasets to MCAP format for visualization in coScene",
+        epilog="Without a command, the arguments are those of convert, e.g. `cli.py --dataset berkeley_autolab_ur5`",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    convert = subparsers.add_parser(
+        "convert", 
+        help="Convert episodes of a dataset to MCAP (default)", 
+        description="Convert episodes of an Open-X-Embodiment dataset to MCAP files", 
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    add_convert_arguments(convert)
+    convert.set_defaults(run=run_convert, error=convert.error)
+
+    index = subparsers.add_parser(
+        "index", 
+        help="Scan a dataset once and write a per-episode index", 
+        description="Scan the episodes of a dataset once, without decoding images, and write their step counts, "
+                    "sizes, instructions and per-dimension state statistics to a columnar NumPy (.npz) index", 
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    index.add_argument(
+        "--dataset", 
+        default="berkeley_autolab_ur5", 
+        help="Dataset name to index"
+    )
+    index.add_argument(
+        "--start", 
+        type=int, 
+        default=0, 
+        help="First episode to index"
+    )
+    index.add_argument(
+        "--end", 
+        type=int, 
+        help="Last episode to index (default: the last episode of the dataset)"
+    )
+    index.add_argument(
+        "--output", 
+        metavar="PATH", 
+        help="Path of the index file (default: <output-dir>/<dataset>.index.npz)"
+    )
+    index.add_argument(
+        "--output-dir", 
+        default="mcap_files", 
+        help="Directory of the index file when --output is not given"
+    )
+    add_source_arguments(index)
+    index.set_defaults(run=run_index, error=index.error)
+
+    merge = subparsers.add_parser(
+        "merge-manifests", 
+        help="Merge the manifest fragments of all shards into one manifest", 
+        description="Merge the manifest fragments written by the shards of a conversion into one manifest", 
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    merge.add_argument(
+        "--output-dir", 
+        default="mcap_files", 
+        help="Output directory holding the manifest fragments"
+    )
+    merge.set_defaults(run=run_merge_manifests, error=merge.error)
+
+    list_schemas = subparsers.add_parser(
+        "list-schemas", 
+        help="List the datasets that have a schema", 
+        description="List the datasets that have a schema, without importing any of them"
+    )
+    list_schemas.set_defaults(run=run_list_schemas, error=list_schemas.error)
+    return parser
+
+
+def run_list_schemas(args):
+    """Print the datasets that have a schema"""
+    from common.schemas import available_schemas
+
+    for dataset_name in available_schemas():
+        print(dataset_name)
+
+
+def run_merge_manifests(args):
+    """Merge the manifest fragments of all shards in the output directory"""
+    from open_x_embodiment.sharding import merge_manifests
+
+    try:
+        merge_manifests(args.output_dir)
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not merge manifests: {e}")
+
+
+def source_options_from_args(args):
+    """Get the keyword arguments of `load_builder` from the source arguments"""
+    from open_x_embodiment.cache import parse_size
+
+    try:
+        cache_size = parse_size(args.cache_size) if args.cache_size else None
+    except ValueError as e:
+        args.error(str(e))
+    return {
+        "data_root": args.data_root,
+        "cache_dir": args.cache_dir,
+        "cache_size": cache_size,
+        "offline": args.offline,
+    }
+
+
+def run_index(args):
+    """Scan a dataset and write its episode index"""
+    from open_x_embodiment.index import build_index, index_filename
+
+    source_options = source_options_from_args(args)
+    output = args.output or os.path.join(args.output_dir, index_filename(args.dataset))
+
+    try:
+        episode_index = build_index(args.dataset, args.start, args.end, source_options)
+    except Exception as e:
+        print(f"Error: Could not index dataset '{args.dataset}': {e}")
+        return
+    episode_index.save(output)
+    summary = episode_index.summary()
+    print(f"Index of {summary['episodes']} episodes written to {output}: {summary['steps']} steps "
+          f"({summary['min_steps']}-{summary['max_steps']} per episode), {summary['num_bytes'] / 1e6:.1f} MB, "
+          f"{summary['empty_episodes']} empty episodes")
+
+
+def run_convert(args):
+    """Convert a single episode, a range of episodes or a shard of a dataset"""
+    from common.images import apply_image_preset, parse_image_codecs, parse_image_transforms
+    from common.profiling import Profiler, merge_reports, write_profile
+    from common.schemas import UnknownDatasetError, schema_class_for_dataset
+    from open_x_embodiment.cache import parse_size
+    from open_x_embodiment.writer_options import resolve_writer_options
+
+    error = args.error
+    # Fail before reading any data rather than after converting it with the wrong schema
+    try:
+        schema_class_for_dataset(args.dataset)
+    except UnknownDatasetError as e:
+        error(str(e))
+    
+    try:
+        image_options = apply_image_preset(
+            args.image_preset,
+            parse_image_codecs(args.image_codec),
+            parse_image_transforms(args.image_resize, args.image_crop, args.image_every_nth),
+            args.depth_format,
+        )
+    except ValueError as e:
+        error(str(e))
+    if args.depth_scale <= 0:
+        error(f"Invalid depth scale: {args.depth_scale}")
+    if args.every_nth_step < 1:
+        error(f"Invalid step decimation: {args.every_nth_step}")
+    source_options = source_options_from_args(args)
+    try:
+        writer_options = resolve_writer_options(
+            args.writer_preset,
+            compression=args.mcap_compression,
+            compression_level=args.mcap_compression_level,
+            chunk_size=parse_size(args.mcap_chunk_size) if args.mcap_chunk_size else None,
+            message_indexes=False if args.no_mcap_index else None,
+        )
+    except ValueError as e:
+        error(str(e))
+    try:
+        memory_limit = parse_size(args.memory_limit) if args.memory_limit else None
+    except ValueError as e:
+        error(str(e))
+    episode_index = None
+    if args.index:
+        from open_x_embodiment.index import EpisodeIndex
+
+        try:
+            episode_index = EpisodeIndex.load(args.index)
+        except (OSError, ValueError) as e:
+            error(f"Could not read the episode index: {e}")
+        if episode_index.dataset_name != args.dataset:
+            error(f"Episode index {args.index} is of dataset {episode_index.dataset_name}, not {args.dataset}")
+        episode_index = episode_index.query(min_steps=args.min_steps, max_steps=args.max_steps)
+    elif args.min_steps is not None or args.max_steps is not None:
+        error("--min-steps and --max-steps need an episode index (--index)")
+    schema_options = {
+        "jpeg_quality": args.jpeg_quality,
+        "image_passthrough": args.passthrough_images,
+        "message_encoding": args.message_encoding,
+        "latch": not args.repeat_latched,
+        "depth_scale": args.depth_scale,
+        "topics": args.topics,
+        "exclude_topics": args.exclude_topics,
+        **image_options,
+    }
     
-    args = parser.parse_args()
+    # Everything below reads TFDS data, which needs TensorFlow
+    from open_x_embodiment.converter import convert_episode, batch_convert_episodes
+    from open_x_embodiment.data_loader import load_dataset
+    from open_x_embodiment.sharding import plan_shard, shard_manifest_filename
     
     # Create output directory if it doesn't exist
     os.makedirs(args.output_dir, exist_ok=True)
     
-    if args.batch:
+    batch_options = {
+        "verbose": args.verbose,
+        "workers": args.workers,
+        "schema_options": schema_options,
+        "control_rate_hz": args.rate,
+        "start_time": args.start_time,
+        "source_options": source_options,
+        "resume": args.resume,
+        "profile": bool(args.profile),
+        "step_batch_size": args.step_batch_size,
+        "pipeline": not args.no_pipeline,
+        "writer_options": writer_options,
+        "memory_limit": memory_limit,
+        "every_nth_step": args.every_nth_step,
+        "episode_index": episode_index,
+    }
+    
+    if args.num_shards is not None:
+        try:
+            shard_range = plan_shard(args.dataset, args.shard_index, args.num_shards, source_options,
+                                     episode_index=episode_index)
+        except ValueError as e:
+            error(str(e))
+        if shard_range is not None:
+            results = batch_convert_episodes(
+                args.dataset, 
+                shard_range[0], 
+                shard_range[1], 
+                args.output_dir,
+                manifest_name=shard_manifest_filename(args.shard_index, args.num_shards),
+                **batch_options
+            )
+            if args.profile:
+                write_profile(merge_reports(r.get("profile") for r in results), args.profile)
+        print(f"Shard {args.shard_index} of {args.num_shards} complete. Output files saved to {args.output_dir}/")
+    elif args.batch:
         print(f"Batch converting episodes {args.start} to {args.end} from dataset '{args.dataset}'")
-        batch_convert_episodes(
+        results = batch_convert_episodes(
             args.dataset, 
             args.start, 
             args.end, 
-            args.output_dir
+            args.output_dir,
+            **batch_options
         )
+        if args.profile:
+            write_profile(merge_reports(r.get("profile") for r in results), args.profile)
         print(f"Batch conversion complete. Output files saved to {args.output_dir}/")
     else:
         print(f"Converting episode {args.episode} from dataset '{args.dataset}'")
         # Load dataset
-        _, episode = load_dataset(args.dataset, args.episode)
+        _, episode = load_dataset(
+            args.dataset, 
+            args.episode, 
+            skip_image_decoding=args.passthrough_images, 
+            source_options=source_options,
+            drop_features=schema_class_for_dataset(args.dataset).unused_features(args.topics, args.exclude_topics)
+        )
         
         if episode is not None:
             # Create output filename
@@ -100,17 +575,42 @@ def main():
             )
             
             # Convert
-            convert_episode(
-                episode, 
-                filename, 
-                args.dataset,  
-                args.rate, 
-                args.live,
-                verbose=args.verbose
-            )
-            print(f"Conversion complete. Output saved to {filename}")
+            profiler = Profiler() if args.profile else None
+            try:
+                convert_episode(
+                    episode, 
+                    filename, 
+                    args.dataset,  
+                    args.rate, 
+                    args.live,
+                    verbose=args.verbose,
+                    schema_options=schema_options,
+                    start_time=args.start_time,
+                    live_buffer_size=args.live_buffer_size,
+                    profiler=profiler,
+                    step_batch_size=args.step_batch_size,
+                    pipeline=not args.no_pipeline,
+                    writer_options=writer_options,
+                    memory_limit=memory_limit,
+                    every_nth_step=args.every_nth_step
+                )
+                print(f"Conversion complete. Output saved to {filename}")
+                if profiler:
+                    write_profile(profiler.report(), args.profile)
+            except Exception as e:
+                print(f"Error: Could not convert episode {args.episode}: {e}")
         else:
             print(f"Error: Could not load episode {args.episode} from dataset '{args.dataset}'")
 
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS + ("-h", "--help"):
+        argv = ["convert"] + argv
+
+    args = build_parser().parse_args(argv)
+    args.run(args)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -13,7 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from foxglove import Channel
 from foxglove.schemas import RawImage, FrameTransform, Vector3, Quaternion
 from foxglove.channels import RawImageChannel, FrameTransformChannel
@@ -24,8 +24,9 @@ from common.schemas import DatasetSchema, language_instruction_schema, float_sch
 class DefaultSchema(DatasetSchema):
     """Default dataset schema for standard Open-X-Embodiment datasets"""
     
-    def __init__(self):
+    def __init__(self, **schema_options):
         """Initialize the schema with a step index counter"""
+        super().__init__(**schema_options)
         self.step_idx = 0
     
     def setup_channels(self) -> Dict[str, Channel]:
@@ -39,7 +40,8 @@ class DefaultSchema(DatasetSchema):
         # This method should be implemented by subclasses
         pass
     
-    def process_step(self, step: Dict[str, Any], channels: Dict[str, Channel], verbose: bool = False) -> None:
+    def process_step(self, step: Dict[str, Any], channels: Dict[str, Channel], verbose: bool = False,
+                     log_time: Optional[int] = None) -> None:
         """Process data for a single step"""
         # Print step information if verbose mode is enabled
         if verbose:
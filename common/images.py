@@ -0,0 +1,662 @@
+"""Image message helpers shared by dataset schemas"""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from foxglove import Channel
+from foxglove.schemas import RawImage, CompressedImage, Timestamp
+from foxglove.channels import RawImageChannel, CompressedImageChannel
+
+from common.profiling import NULL_PROFILER
+
+# Supported image codecs; "raw" publishes uncompressed RawImage messages
+IMAGE_CODECS = ("raw", "jpeg", "png")
+
+# Storage formats of floating point depth images: "32FC1" publishes them as
+# they are, "16UC1" quantizes them to 16-bit integers, and "png" also stores
+# the quantized images as lossless 16-bit PNG
+DEPTH_FORMATS = ("32FC1", "16UC1", "png")
+
+# RawImage encodings of floating point depth images
+FLOAT_DEPTH_ENCODINGS = ("32FC1",)
+
+_UINT16_MAX = np.iinfo(np.uint16).max
+
+# Image presets, as codec and transform settings for all image topics.
+# Settings given for all topics or for a single topic override them.
+IMAGE_PRESETS = {
+    # Half resolution at half the frame rate, for triage. Depth images are
+    # quantized but not compressed, as PNG would take longer than the rest
+    "preview": {"codec": "jpeg", "depth_format": "16UC1", "resize": 0.5, "every_nth": 2},
+    # Quarter resolution at a fifth of the frame rate, for browsing many episodes
+    "thumbnail": {"codec": "jpeg", "depth_format": "16UC1", "resize": 0.25, "every_nth": 5},
+}
+
+
+def as_contiguous_array(tensor: Any) -> np.ndarray:
+    """View a tensor as a C-contiguous NumPy array.
+
+    Unlike `tensor.numpy()`, which always returns a defensive copy of an
+    eager tensor, `np.asarray` goes through the buffer protocol and shares
+    the tensor's memory. A copy is only made if the data is not contiguous.
+
+    Args:
+        tensor: Eager tensor or array-like image data
+
+    Returns:
+        Read-only or writable C-contiguous array
+    """
+    return np.ascontiguousarray(np.asarray(tensor))
+
+
+def timestamp_from_ns(log_time: Optional[int]) -> Optional[Timestamp]:
+    """Convert a log time in nanoseconds to a message timestamp"""
+    if log_time is None:
+        return None
+    return Timestamp(sec=log_time // 1_000_000_000, nsec=log_time % 1_000_000_000)
+
+
+def raw_image(tensor: Any, encoding: str, log_time: Optional[int] = None) -> RawImage:
+    """Build a RawImage message from an image tensor.
+
+    The pixel buffer is copied exactly once, into the `bytes` object the
+    RawImage binding requires. Width, height and row step are taken from
+    the array itself instead of being hard-coded per encoding.
+
+    Args:
+        tensor: Image tensor of shape (height, width) or (height, width, channels)
+        encoding: RawImage encoding, e.g. "rgb8" or "32FC1"
+        log_time: Log time in nanoseconds, used as the image timestamp
+
+    Returns:
+        RawImage message
+    """
+    array = as_contiguous_array(tensor)
+    return RawImage(
+        timestamp=timestamp_from_ns(log_time),
+        data=array.tobytes(),
+        width=array.shape[1],
+        height=array.shape[0],
+        step=array.strides[0],
+        encoding=encoding,
+    )
+
+
+def quantize_depth(array: Any, depth_scale: float = 1000.0) -> np.ndarray:
+    """Quantize a floating point depth image to 16-bit integers.
+
+    Depths are multiplied by `depth_scale` and rounded, in a single pass
+    over the whole frame. Depths beyond the 16-bit range are clipped to its
+    maximum, and missing depths (NaN, or not positive) become 0, which
+    16UC1 depth images use for "no measurement".
+
+    Args:
+        array: Depth image in metres (or any unit `depth_scale` applies to)
+        depth_scale: Number of integer steps per unit, 1000 stores metres as millimetres
+
+    Returns:
+        uint16 array of the same shape
+    """
+    scaled = np.multiply(array, depth_scale, dtype=np.float32)
+    # Unlike np.clip, fmax and fmin replace NaN with the bound
+    np.fmax(scaled, 0, out=scaled)
+    np.fmin(scaled, _UINT16_MAX, out=scaled)
+    np.rint(scaled, out=scaled)
+    return scaled.astype(np.uint16)
+
+
+def depth_metadata(depth_scale: float = 1000.0) -> Dict[str, str]:
+    """Describe how depth images of a channel were quantized, as channel metadata
+
+    Args:
+        depth_scale: Scale passed to `quantize_depth`
+
+    Returns:
+        Dictionary of strings: the scale, the depth of one step and the range of stored depths, in metres
+    """
+    return {
+        "depth_encoding": "16UC1",
+        "depth_scale": f"{depth_scale:g}",
+        "depth_unit": "m",
+        "depth_min": f"{1 / depth_scale:g}",
+        "depth_max": f"{_UINT16_MAX / depth_scale:g}",
+        "depth_invalid_value": "0",
+    }
+
+
+def crop_image(array: np.ndarray, crop: Tuple[int, int, int, int]) -> np.ndarray:
+    """Crop an image to a region of interest, without copying it
+
+    Args:
+        array: Image array of shape (height, width) or (height, width, channels)
+        crop: (x, y, width, height) of the region in pixels; it is clipped to the image
+
+    Returns:
+        View of the region
+    """
+    x, y, width, height = crop
+    region = array[y:y + height, x:x + width]
+    if not region.size:
+        raise ValueError(f"Crop {crop} is outside of the {array.shape[1]}x{array.shape[0]} image")
+    return region
+
+
+def resize_image(array: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Resize an image with NumPy indexing.
+
+    8-bit images shrunk by an integer factor are averaged over each block
+    of pixels. Other images, such as depth images, whose missing values
+    must not be averaged with valid ones, take the nearest pixel.
+
+    Args:
+        array: Image array of shape (height, width) or (height, width, channels)
+        width: Width of the resized image
+        height: Height of the resized image
+
+    Returns:
+        Resized image array
+    """
+    in_height, in_width = array.shape[:2]
+    if (in_width, in_height) == (width, height):
+        return array
+    if array.dtype == np.uint8 and in_height % height == 0 and in_width % width == 0:
+        factor_y, factor_x = in_height // height, in_width // width
+        blocks = array.reshape(height, factor_y, width, factor_x, *array.shape[2:])
+        sums = blocks.sum(axis=(1, 3), dtype=np.uint32)
+        return ((sums + factor_y * factor_x // 2) // (factor_y * factor_x)).astype(np.uint8)
+    rows = ((np.arange(height) + 0.5) * in_height / height).astype(np.intp)
+    cols = ((np.arange(width) + 0.5) * in_width / width).astype(np.intp)
+    return array[rows[:, np.newaxis], cols]
+
+
+class ImageTransform:
+    """Crop, resize and frame decimation of the images of a topic.
+
+    Images are cropped to a region of interest first, then resized, either
+    by a scale factor or to a fixed size. Only every `every_nth` frame of
+    the topic is kept, starting with the first.
+    """
+
+    def __init__(self, crop: Optional[Tuple[int, int, int, int]] = None, resize: Any = None, every_nth: int = 1):
+        """Initialize the transform
+
+        Args:
+            crop: (x, y, width, height) of the region of interest in pixels
+            resize: Scale factor, or (width, height) of the resized images
+            every_nth: Keep every n-th frame
+        """
+        if every_nth < 1:
+            raise ValueError(f"Invalid frame decimation: {every_nth}")
+        if isinstance(resize, (int, float)) and not 0 < resize <= 1:
+            raise ValueError(f"Invalid image scale: {resize}, expected a factor between 0 and 1")
+        self.crop = crop
+        self.resize = resize
+        self.every_nth = every_nth
+
+    @property
+    def changes_pixels(self) -> bool:
+        """Whether the transform crops or resizes images"""
+        return self.crop is not None or self.resize not in (None, 1)
+
+    def check(self, shape: Tuple[int, ...]) -> None:
+        """Check that the transform fits images of a shape
+
+        Raises:
+            ValueError: If the crop is outside of the images
+        """
+        if self.crop is not None:
+            x, y = self.crop[:2]
+            if x >= shape[1] or y >= shape[0]:
+                raise ValueError(f"Crop {self.crop} is outside of the {shape[1]}x{shape[0]} image")
+
+    def keeps(self, frame_index: int) -> bool:
+        """Check whether a frame of the topic is published"""
+        return frame_index % self.every_nth == 0
+
+    def apply(self, array: np.ndarray) -> np.ndarray:
+        """Crop and resize an image array"""
+        if self.crop is not None:
+            array = crop_image(array, self.crop)
+        if isinstance(self.resize, tuple):
+            array = resize_image(array, *self.resize)
+        elif self.resize not in (None, 1):
+            height, width = array.shape[:2]
+            array = resize_image(array, max(1, round(width * self.resize)), max(1, round(height * self.resize)))
+        return array
+
+    def metadata(self, pixels: bool = True) -> Dict[str, str]:
+        """Describe the transform as channel metadata
+
+        Args:
+            pixels: Whether the images are cropped and resized; images published
+                still encoded are only decimated
+        """
+        metadata = {}
+        if pixels and self.crop is not None:
+            metadata["image_crop"] = ",".join(map(str, self.crop))
+        if pixels and isinstance(self.resize, tuple):
+            metadata["image_size"] = "{}x{}".format(*self.resize)
+        elif pixels and self.resize not in (None, 1):
+            metadata["image_scale"] = f"{self.resize:g}"
+        if self.every_nth > 1:
+            metadata["image_every_nth"] = str(self.every_nth)
+        return metadata
+
+
+def encoded_image_format(data: bytes) -> str:
+    """Detect the CompressedImage format of encoded image bytes"""
+    if data.startswith(b"\xff\xd8"):
+        return "jpeg"
+    if data.startswith(b"\x89PNG"):
+        return "png"
+    raise ValueError("Unrecognized encoded image format")
+
+
+def is_encoded_image(tensor: Any) -> bool:
+    """Check whether a tensor holds encoded image bytes rather than pixels"""
+    # Compared by name so that TensorFlow isn't needed: tf.string tensors, and
+    # NumPy object arrays of bytes, which is what they convert to
+    return isinstance(tensor, bytes) or getattr(getattr(tensor, "dtype", None), "name", None) in ("string", "object")
+
+
+def unstack_images(images: Any) -> List[Any]:
+    """Split a batch of images into per-step images with a single NumPy conversion.
+
+    Decoded images become views into one array of shape (steps, height,
+    width, channels); encoded images become `bytes` objects.
+
+    Args:
+        images: Tensor of stacked images, or of encoded image strings
+
+    Returns:
+        List with one image per step
+    """
+    return list(np.asarray(images))
+
+
+def encode_image(array: np.ndarray, codec: str, jpeg_quality: int = 90, depth_scale: float = 1000.0,
+                 transform: Optional[ImageTransform] = None) -> Tuple[bytes, str]:
+    """Encode an image array.
+
+    Floating point (depth) images are always stored losslessly as 16-bit
+    PNG, after quantization with `quantize_depth` (a `depth_scale` of 1000
+    stores metres as millimetres).
+
+    Args:
+        array: Image array of shape (height, width, channels)
+        codec: "jpeg" or "png"
+        jpeg_quality: JPEG quality between 0 and 100
+        depth_scale: Scale applied to floating point images before quantization
+        transform: Crop and resize applied before encoding, on the encoder thread
+
+    Returns:
+        tuple: Encoded bytes and the codec used, the CompressedImage format
+    """
+    if transform is not None:
+        array = np.ascontiguousarray(transform.apply(array))
+    if array.ndim == 2:
+        array = array[:, :, np.newaxis]
+
+    if np.issubdtype(array.dtype, np.floating):
+        array = quantize_depth(array, depth_scale)
+        codec = "png"
+
+    # Imported here so that the CLI can import this module without loading TensorFlow
+    import tensorflow as tf
+
+    if codec == "jpeg":
+        data = tf.io.encode_jpeg(array, quality=jpeg_quality)
+    elif codec == "png":
+        data = tf.io.encode_png(array)
+    else:
+        raise ValueError(f"Unsupported image codec: {codec}")
+
+    return data.numpy(), codec
+
+
+def parse_image_codecs(specs: Optional[Iterable[str]]) -> Dict[str, str]:
+    """Parse image codec specifications.
+
+    Each specification is either a codec, which applies to every image
+    topic, or `topic=codec` for a single topic, e.g. `/depth_1=png`.
+
+    Args:
+        specs: Codec specifications
+
+    Returns:
+        Dictionary mapping topics (or "*" for all topics) to codecs
+    """
+    codecs = {}
+    for spec in specs or []:
+        topic, codec = _split_topic_spec(spec)
+        if codec not in IMAGE_CODECS:
+            raise ValueError(f"Unknown image codec '{codec}', expected one of {', '.join(IMAGE_CODECS)}")
+        codecs[topic] = codec
+    return codecs
+
+
+def _split_topic_spec(spec: str) -> Tuple[str, str]:
+    """Split a `[topic=]value` specification into its topic, or "*" for all topics, and value"""
+    topic, _, value = spec.rpartition("=")
+    if topic and not topic.startswith("/"):
+        topic = "/" + topic
+    return topic or "*", value
+
+
+def _parse_resize(value: str) -> Any:
+    """Parse a resize specification, a scale factor such as `0.5` or a size such as `320x240`"""
+    width, sep, height = value.lower().partition("x")
+    try:
+        if sep:
+            size = (int(width), int(height))
+            if min(size) < 1:
+                raise ValueError
+            return size
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Invalid image size '{value}', expected a scale factor such as 0.5 or WIDTHxHEIGHT") from None
+
+
+def _parse_crop(value: str) -> Tuple[int, int, int, int]:
+    """Parse a crop specification `x,y,width,height`"""
+    try:
+        crop = tuple(int(item) for item in value.split(","))
+    except ValueError:
+        crop = ()
+    if len(crop) != 4 or min(crop[:2]) < 0 or min(crop[2:]) < 1:
+        raise ValueError(f"Invalid image crop '{value}', expected X,Y,WIDTH,HEIGHT in pixels")
+    return crop
+
+
+def _parse_every_nth(value: str) -> int:
+    """Parse a frame decimation, a positive number of frames"""
+    try:
+        every_nth = int(value)
+    except ValueError:
+        every_nth = 0
+    if every_nth < 1:
+        raise ValueError(f"Invalid frame decimation '{value}', expected a positive integer")
+    return every_nth
+
+
+def parse_image_transforms(resize: Optional[Iterable[str]] = None, crop: Optional[Iterable[str]] = None,
+                           every_nth: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Parse image transform specifications.
+
+    Like codecs, each specification applies to every image topic, or to a
+    single topic as `topic=value`. Settings of a single topic override
+    those for all topics one by one.
+
+    Args:
+        resize: Scale factors such as `0.5`, or sizes such as `320x240`
+        crop: Regions of interest as `x,y,width,height` in pixels
+        every_nth: Frame decimation, keeping every n-th frame
+
+    Returns:
+        Dictionary mapping topics (or "*" for all topics) to `ImageTransform` arguments
+    """
+    transforms = {}
+    for specs, key, parse in ((resize, "resize", _parse_resize), (crop, "crop", _parse_crop),
+                              (every_nth, "every_nth", _parse_every_nth)):
+        for spec in specs or []:
+            topic, value = _split_topic_spec(spec)
+            transforms.setdefault(topic, {})[key] = parse(value)
+    for options in transforms.values():
+        ImageTransform(**options)  # Validate the values
+    return transforms
+
+
+def apply_image_preset(preset: Optional[str], codecs: Dict[str, str], transforms: Dict[str, Dict[str, Any]],
+                       depth_format: Optional[str] = None) -> Dict[str, Any]:
+    """Combine an image preset with the image settings given explicitly
+
+    The preset sets the codec, depth format and transform of all image
+    topics, except for the settings that are given explicitly.
+
+    Args:
+        preset: Name of a preset in `IMAGE_PRESETS`, or None
+        codecs: Codecs as returned by `parse_image_codecs`
+        transforms: Transforms as returned by `parse_image_transforms`
+        depth_format: Depth format, None if not given
+
+    Returns:
+        dict: Schema options "image_codecs", "image_transforms" and "depth_format"
+    """
+    if preset is not None and preset not in IMAGE_PRESETS:
+        raise ValueError(f"Unknown image preset '{preset}', expected one of {', '.join(IMAGE_PRESETS)}")
+    settings = dict(IMAGE_PRESETS.get(preset, {}))
+    codecs = dict(codecs)
+    if "codec" in settings:
+        codecs.setdefault("*", settings.pop("codec"))
+    depth_format = depth_format or settings.pop("depth_format", "32FC1")
+    transforms = dict(transforms)
+    if settings:
+        transforms["*"] = dict(settings, **transforms.get("*", {}))
+    return {"image_codecs": codecs, "image_transforms": transforms, "depth_format": depth_format}
+
+
+class ImagePublisher:
+    """Publishes image tensors as raw or compressed image messages.
+
+    Compressed images are encoded on a thread pool, so compression overlaps
+    with reading and processing the following steps. Messages are still
+    logged from the calling thread in submission order, which keeps the
+    order of every channel intact.
+
+    In passthrough mode every image topic is compressed. Images that are
+    still encoded, as read with TFDS image decoding skipped, are published
+    with their original bytes; decoded images on topics without a codec
+    fall back to lossless PNG.
+
+    Floating point depth images are published as they are with the
+    "32FC1" depth format. The "16UC1" format quantizes them to 16 bits and
+    keeps them raw unless their own topic has a codec, and the "png"
+    format stores them as 16-bit PNG. Compressed depth images are always
+    quantized. Depth topics are those whose channel was created with a
+    floating point encoding; their metadata describes the quantization.
+
+    Topics with a transform keep only every n-th frame, and are cropped and
+    resized before publishing; on the encoder threads for compressed
+    topics. Images published still encoded are only decimated.
+    """
+
+    def __init__(self, codecs: Optional[Dict[str, str]] = None, jpeg_quality: int = 90,
+                 depth_scale: float = 1000.0, max_workers: Optional[int] = None, max_pending: int = 64,
+                 passthrough: bool = False, depth_format: str = "32FC1",
+                 transforms: Optional[Dict[str, Dict[str, Any]]] = None):
+        """Initialize the publisher
+
+        Args:
+            codecs: Dictionary mapping topics (or "*" for all topics) to codecs
+            jpeg_quality: JPEG quality between 0 and 100
+            depth_scale: Scale applied to depth images quantized to 16 bits
+            max_workers: Number of encoder threads, defaults to the executor's default
+            max_pending: Maximum number of images being encoded at once
+            passthrough: Publish already encoded images without re-encoding them
+            depth_format: Storage format of floating point depth images, one of `DEPTH_FORMATS`
+            transforms: Dictionary mapping topics (or "*" for all topics) to `ImageTransform` arguments
+        """
+        if depth_format not in DEPTH_FORMATS:
+            raise ValueError(f"Unknown depth format '{depth_format}', expected one of {', '.join(DEPTH_FORMATS)}")
+        if depth_scale <= 0:
+            raise ValueError(f"Invalid depth scale: {depth_scale}")
+        self.codecs = dict(codecs or {})
+        self.jpeg_quality = jpeg_quality
+        self.depth_scale = depth_scale
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.passthrough = passthrough
+        self.depth_format = depth_format
+        self.transforms = dict(transforms or {})
+        self.profiler = NULL_PROFILER
+        self._executor = None
+        self._pending = collections.deque()
+        self._depth_topics = set()
+        self._topic_transforms = {}
+        self._frame_counts = collections.Counter()
+
+    def codec_for(self, topic: str) -> str:
+        """Get the codec used for a topic"""
+        if topic in self.codecs:
+            codec = self.codecs[topic]
+        elif topic in self._depth_topics and self.depth_format == "16UC1":
+            # Quantized depth stays raw unless its own topic is compressed
+            codec = "raw"
+        else:
+            codec = self.codecs.get("*", "raw")
+        if codec == "raw" and (self.passthrough or (self.depth_format == "png" and topic in self._depth_topics)):
+            return "png"
+        return codec
+
+    def transform_for(self, topic: str) -> Optional[ImageTransform]:
+        """Get the transform of a topic, None if its images are published unchanged"""
+        if topic not in self._topic_transforms:
+            options = dict(self.transforms.get("*", {}), **self.transforms.get(topic, {}))
+            self._topic_transforms[topic] = ImageTransform(**options) if options else None
+        return self._topic_transforms[topic]
+
+    def quantizes_depth(self, topic: str) -> bool:
+        """Check whether floating point depth images of a topic are quantized to 16 bits"""
+        return self.depth_format != "32FC1" or self.codec_for(topic) != "raw"
+
+    def channel(self, topic: str, encoding: Optional[str] = None) -> Channel:
+        """Create an image channel matching the codec of a topic
+
+        Args:
+            topic: Topic of the channel
+            encoding: RawImage encoding of the topic's images, if known. Floating
+                point depth topics need it for the "png" depth format and for
+                their quantization metadata
+        """
+        metadata = {}
+        if encoding in FLOAT_DEPTH_ENCODINGS:
+            self._depth_topics.add(topic)
+            if self.quantizes_depth(topic):
+                metadata.update(depth_metadata(self.depth_scale))
+        transform = self.transform_for(topic)
+        if transform is not None:
+            # In passthrough mode only depth images are decoded, and only decoded images are cropped and resized
+            metadata.update(transform.metadata(pixels=not self.passthrough or encoding in FLOAT_DEPTH_ENCODINGS))
+        metadata = metadata or None
+        if self.codec_for(topic) == "raw":
+            return RawImageChannel(topic=topic, metadata=metadata)
+        return CompressedImageChannel(topic=topic, metadata=metadata)
+
+    def publish(self, channel: Channel, tensor: Any, encoding: str, log_time: Optional[int] = None) -> None:
+        """Publish an image tensor on a channel created by `channel()`
+
+        Args:
+            channel: Image channel
+            tensor: Image tensor or array of shape (height, width) or (height, width, channels), or encoded bytes
+            encoding: RawImage encoding, used when the topic is published raw
+            log_time: Log time in nanoseconds, None for the current time
+        """
+        topic = channel.topic()
+        transform = self.transform_for(topic)
+        if transform is not None:
+            frame_index = self._frame_counts[topic]
+            self._frame_counts[topic] += 1
+            if not transform.keeps(frame_index):
+                return
+            if not transform.changes_pixels:
+                transform = None
+
+        if is_encoded_image(tensor):
+            if transform is not None and frame_index == 0:
+                print(f"Images of {topic} are published as read, without decoding, so they are neither cropped "
+                      f"nor resized")
+            with self.profiler.stage("passthrough"):
+                data = tensor if isinstance(tensor, bytes) else tensor.numpy()
+                msg = CompressedImage(timestamp=timestamp_from_ns(log_time), data=data, format=encoded_image_format(data))
+            channel.log(msg, log_time=log_time)
+            self.profiler.add_bytes(topic, len(data))
+            return
+
+        codec = self.codec_for(topic)
+        if codec == "raw":
+            if transform is not None:
+                with self.profiler.stage("transform_image"):
+                    tensor = transform.apply(as_contiguous_array(tensor))
+            if encoding in FLOAT_DEPTH_ENCODINGS and self.depth_format != "32FC1":
+                with self.profiler.stage("quantize_depth"):
+                    tensor = quantize_depth(as_contiguous_array(tensor), self.depth_scale)
+                    encoding = "16UC1"
+            with self.profiler.stage("raw_image"):
+                array = as_contiguous_array(tensor)
+                msg = raw_image(array, encoding, log_time)
+            channel.log(msg, log_time=log_time)
+            self.profiler.add_bytes(topic, array.nbytes)
+            return
+
+        array = as_contiguous_array(tensor)
+        if transform is not None:
+            # Fail here, for this topic and step, rather than later on an encoder thread
+            transform.check(array.shape)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="image-encoder")
+        with self.profiler.stage("submit_encode"):
+            future = self._executor.submit(
+                self._encode_image, array, codec, self.jpeg_quality, self.depth_scale, log_time,
+                transform
+            )
+        self._pending.append((channel, future, log_time))
+        self._log_encoded(self.max_pending)
+
+    def flush(self) -> None:
+        """Wait for all pending images and publish them"""
+        self._log_encoded(0)
+
+    def close(self) -> None:
+        """Stop the encoder threads, discarding images that were not flushed"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._pending.clear()
+
+    def _log_encoded(self, max_pending: int) -> None:
+        """Log finished images in order, blocking while more than `max_pending` are queued
+
+        An image that fails to encode is reported against its own topic and
+        skipped, like images of raw topics, and the images queued behind it
+        are still logged.
+        """
+        while self._pending and (self._pending[0][1].done() or len(self._pending) > max_pending):
+            channel, future, log_time = self._pending.popleft()
+            try:
+                with self.profiler.stage("wait_encoded"):
+                    msg, size = future.result()
+            except Exception as e:
+                print(f"Error encoding image of {channel.topic()} at log time {log_time}: {e}")
+                continue
+            channel.log(msg, log_time=log_time)
+            self.profiler.add_bytes(channel.topic(), size)
+
+    def _encode_image(self, array: np.ndarray, codec: str, jpeg_quality: int, depth_scale: float,
+                      log_time: Optional[int], transform: Optional[ImageTransform]) -> Tuple[CompressedImage, int]:
+        """Encode an image on an encoder thread, reporting the time to the profiler
+
+        Returns:
+            CompressedImage message and the size of its encoded data
+        """
+        start = time.perf_counter()
+        data, codec = encode_image(array, codec, jpeg_quality, depth_scale, transform)
+        msg = CompressedImage(timestamp=timestamp_from_ns(log_time), data=data, format=codec)
+        if self.profiler.enabled:
+            self.profiler.add_time("encode_image (encoder threads)", time.perf_counter() - start)
+        return msg, len(data)
@@ -0,0 +1,269 @@
+"""Declarative dataset schemas mapping step features to topics"""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from foxglove import Channel
+from foxglove.channels import FrameTransformChannel
+from foxglove.schemas import FrameTransform, Quaternion, Vector3
+
+from common.images import timestamp_from_ns, unstack_images
+from common.schemas import DatasetSchema
+
+# Message types a step feature can be mapped to
+MESSAGE_TYPES = ("text", "float", "joint_state", "frame_transform", "image")
+
+# Number of columns each message type takes from its feature, None for any
+_MESSAGE_COLUMNS = {"float": 1, "frame_transform": 7}
+
+# Profiling stage of each message type; other types are robot state
+_MESSAGE_STAGES = {"text": "language", "image": "images"}
+
+# Order in which the stages of a step are published
+_STAGE_ORDER = ("language", "images", "robot_state")
+
+
+@dataclass(frozen=True)
+class FieldMapping:
+    """Maps a step feature to the messages of a topic
+
+    Attributes:
+        topic: Topic of the channel, e.g. "/joint_state"
+        feature: Path of the step feature, e.g. "observation/robot_state"
+        message: Message type, one of `MESSAGE_TYPES`
+        columns: (start, stop) of the columns of a vector feature to use, None for the whole feature.
+            Frame transforms take seven columns: translation x, y, z and rotation quaternion x, y, z, w
+        key: Key of the channel in the dictionary of `setup_channels()`, by default the topic without slashes
+        encoding: RawImage encoding of image features, e.g. "rgb8" or "32FC1" for depth
+        parent_frame_id: Parent frame of frame transforms
+        child_frame_id: Child frame of frame transforms
+        latched: Publish the topic only when its message changes, e.g. for constant instructions
+    """
+    topic: str
+    feature: str
+    message: str
+    columns: Optional[Tuple[int, int]] = None
+    key: Optional[str] = None
+    encoding: str = "rgb8"
+    parent_frame_id: str = "robot_base"
+    child_frame_id: str = "end_effector"
+    latched: bool = False
+
+    def __post_init__(self):
+        if self.message not in MESSAGE_TYPES:
+            raise ValueError(f"Unknown message type '{self.message}' of topic {self.topic}, "
+                             f"expected one of {', '.join(MESSAGE_TYPES)}")
+        width = _MESSAGE_COLUMNS.get(self.message)
+        if self.columns is not None and width is not None and self.columns[1] - self.columns[0] != width:
+            raise ValueError(f"Topic {self.topic} needs {width} columns of {self.feature}, got {self.columns}")
+        if self.message == "frame_transform" and self.columns is None:
+            raise ValueError(f"Topic {self.topic} needs the columns of {self.feature} holding the transform")
+
+    @property
+    def channel_key(self) -> str:
+        """Key of the channel in the dictionary of `setup_channels()`"""
+        return self.key or self.topic.strip("/")
+
+    @property
+    def stage(self) -> str:
+        """Profiling stage the topic is published in"""
+        return _MESSAGE_STAGES.get(self.message, "robot_state")
+
+
+def _step_feature(step: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    """Get a feature of a step by its path, None if the step doesn't have it"""
+    value = step
+    for part in path:
+        if part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+class MappedSchema(DatasetSchema):
+    """Dataset schema defined by a list of field mappings
+
+    Instead of hand-written `process_step()` loops, a schema lists what
+    every topic is built from:
+
+        @register_schema("new_dataset")
+        class NewDatasetSchema(MappedSchema):
+            mappings = (
+                FieldMapping("/instruction", "language_instruction", "text", latched=True),
+                FieldMapping("/image", "observation/image", "image"),
+                FieldMapping("/joint_state", "observation/state", "joint_state", columns=(0, 6)),
+            )
+
+    `topic_features` and `latched_channels` are derived from the mappings.
+    Every mapping is compiled once into a function that builds the messages
+    of a whole batch from NumPy arrays, and every feature is converted to
+    NumPy once per batch however many topics use it.
+    """
+
+    # Field mappings of the dataset, see `FieldMapping`
+    mappings: Sequence[FieldMapping] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "mappings" in cls.__dict__:
+            topic_features = {}
+            for mapping in cls.mappings:
+                topic_features.setdefault(mapping.topic, ())
+                topic_features[mapping.topic] += (mapping.feature,)
+            cls.topic_features = topic_features
+            cls.latched_channels = tuple(mapping.channel_key for mapping in cls.mappings if mapping.latched)
+
+    def __init__(self, **schema_options):
+        """Initialize the schema and compile its mappings
+
+        Args:
+            **schema_options: Keyword arguments of `DatasetSchema`
+        """
+        super().__init__(**schema_options)
+        self.step_idx = 0
+        self._compiled = [
+            (mapping, mapping.channel_key, tuple(mapping.feature.split("/")), self._compile(mapping))
+            for mapping in self.mappings
+        ]
+        self._stages = [
+            (stage, [compiled for compiled in self._compiled if compiled[0].stage == stage]) for stage in _STAGE_ORDER
+        ]
+
+    def _compile(self, mapping: FieldMapping) -> Callable[[np.ndarray, List[Optional[int]]], List[Any]]:
+        """Build the function that turns the stacked values of a feature into one message per step"""
+        columns = slice(*mapping.columns) if mapping.columns else None
+
+        def select(values):
+            if columns is None:
+                return values
+            if values.shape[-1] < columns.stop:
+                raise ValueError(f"{mapping.feature} has {values.shape[-1]} columns, "
+                                 f"{mapping.topic} needs {columns.start}:{columns.stop}")
+            return values[:, columns]
+
+        if mapping.message == "text":
+            def build(values, log_times):
+                return [self.messages.text(value.decode("utf-8")) for value in values.tolist()]
+        elif mapping.message == "float":
+            def build(values, log_times):
+                return self.messages.float_values(select(values).reshape(len(values)))
+        elif mapping.message == "joint_state":
+            def build(values, log_times):
+                return self.messages.joint_states(select(values).reshape(len(values), -1))
+        else:
+            parent_frame_id, child_frame_id = mapping.parent_frame_id, mapping.child_frame_id
+
+            def build(values, log_times):
+                return [
+                    FrameTransform(
+                        timestamp=timestamp_from_ns(log_time),
+                        parent_frame_id=parent_frame_id,
+                        child_frame_id=child_frame_id,
+                        translation=Vector3(x=x, y=y, z=z),
+                        rotation=Quaternion(x=qx, y=qy, z=qz, w=qw),
+                    )
+                    for (x, y, z, qx, qy, qz, qw), log_time in zip(select(values).tolist(), log_times)
+                ]
+        return build
+
+    def setup_channels(self) -> Dict[str, Channel]:
+        """Set up a channel for every mapping"""
+        channels = {}
+        for mapping in self.mappings:
+            if mapping.message == "text":
+                channel = self.messages.text_channel(mapping.topic)
+            elif mapping.message == "float":
+                channel = self.messages.float_channel(mapping.topic)
+            elif mapping.message == "joint_state":
+                channel = self.messages.joint_state_channel(mapping.topic)
+            elif mapping.message == "frame_transform":
+                channel = FrameTransformChannel(topic=mapping.topic)
+            else:
+                channel = self.images.channel(mapping.topic, mapping.encoding)
+            channels[mapping.channel_key] = channel
+        return channels
+
+    def print_step_info(self, step: Dict[str, Any], step_index: int) -> None:
+        """Print the mapped features of a step"""
+        print(f"Step {step_index}:")
+        printed = set()
+        for mapping, _, path, _ in self._compiled:
+            value = _step_feature(step, path)
+            if value is None or mapping.feature in printed:
+                continue
+            printed.add(mapping.feature)
+            if mapping.message == "image":
+                print(f"  {mapping.feature} shape: {value.shape}")
+            else:
+                print(f"  {mapping.feature}: {np.asarray(value)}")
+
+    def process_step(self, step: Dict[str, Any], channels: Dict[str, Channel], verbose: bool = False,
+                     log_time: Optional[int] = None) -> None:
+        """Process a single step through the mappings"""
+        if verbose:
+            self.print_step_info(step, self.step_idx)
+        self._publish(step, channels, [log_time], stacked=False)
+        self.step_idx += 1
+
+    def process_steps(self, batch: Dict[str, Any], channels: Dict[str, Channel], verbose: bool = False,
+                      log_times: Optional[List[int]] = None) -> None:
+        """Process a batch of steps through the mappings, converting each feature to NumPy once"""
+        if verbose or log_times is None:
+            super().process_steps(batch, channels, verbose, log_times)
+            return
+        self._publish(batch, channels, log_times, stacked=True)
+        self.step_idx += len(log_times)
+
+    def _publish(self, data: Dict[str, Any], channels: Dict[str, Channel], log_times: List[Optional[int]],
+                 stacked: bool) -> None:
+        """Publish the messages of the mapped channels for one step or a batch of stacked steps"""
+        arrays = {}
+        for stage, compiled in self._stages:
+            with self.profiler.stage(stage):
+                logs, messages = [], []
+                for mapping, key, path, build in compiled:
+                    if key not in channels:
+                        continue
+                    try:
+                        tensor = _step_feature(data, path)
+                        if tensor is None:
+                            continue
+                        if mapping.message == "image":
+                            images = unstack_images(tensor) if stacked else [tensor]
+                            for image, log_time in zip(images, log_times):
+                                self.images.publish(channels[key], image, mapping.encoding, log_time)
+                            continue
+                        if path not in arrays:
+                            values = tensor.numpy()
+                            arrays[path] = values if stacked else np.asarray(values)[np.newaxis]
+                        values = arrays[path]
+                        if mapping.latched:
+                            # Don't decode or encode repeated values; the few changes are logged right away
+                            steps = [i for i, value in enumerate(values) if self.changed(key, value)]
+                            changed_times = [log_times[i] for i in steps]
+                            for message, log_time in zip(build(values[steps], changed_times), changed_times):
+                                channels[key].log(message, log_time=log_time)
+                        else:
+                            messages.append(build(values, log_times))
+                            logs.append(channels[key].log)
+                    except Exception as e:
+                        print(f"Error processing {mapping.topic} from step {self.step_idx}: {e}")
+
+                # Publish the messages of a step together, in step order
+                for log_time, step_messages in zip(log_times, zip(*messages)):
+                    for log, message in zip(logs, step_messages):
+                        log(message, log_time=log_time)
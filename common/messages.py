@@ -0,0 +1,191 @@
+"""Encoders for the scalar, joint state and text channels of dataset schemas"""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Dict, List, Union
+
+import numpy as np
+from foxglove import Channel, Schema
+from google.protobuf import descriptor_pb2
+
+# Supported message encodings of non-image channels
+MESSAGE_ENCODINGS = ("json", "protobuf")
+
+PROTOBUF_PACKAGE = "coscene.converter"
+
+# JSON schemas
+language_instruction_schema = {
+    "type": "object",
+    "properties": {
+        "text": {"type": "string"}
+    }
+}
+
+float_schema = {
+    "type": "object",
+    "properties": {
+        "value": {
+            "type": "number",
+            "format": "float",
+        },
+    },
+}
+
+joint_state_schema = {
+    "type": "object",
+    "properties": {
+        "joint0": {"type": "number", "format": "float"},
+        "joint1": {"type": "number", "format": "float"},
+        "joint2": {"type": "number", "format": "float"},
+        "joint3": {"type": "number", "format": "float"},
+        "joint4": {"type": "number", "format": "float"},
+        "joint5": {"type": "number", "format": "float"},
+    },
+}
+
+# Protobuf wire format tags of field 1
+_TAG_FIXED32 = 0x0D
+_TAG_LENGTH_DELIMITED = 0x0A
+
+
+def _protobuf_schema(message_name: str, field_name: str, field_type: int, repeated: bool = False) -> Schema:
+    """Build the schema of a protobuf message with a single field numbered 1"""
+    file_proto = descriptor_pb2.FileDescriptorProto(
+        name=f"coscene/converter/{message_name}.proto",
+        package=PROTOBUF_PACKAGE,
+        syntax="proto3",
+    )
+    message = file_proto.message_type.add(name=message_name)
+    message.field.add(
+        name=field_name,
+        number=1,
+        type=field_type,
+        label=descriptor_pb2.FieldDescriptorProto.LABEL_REPEATED if repeated
+        else descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL,
+        json_name=field_name,
+    )
+    descriptor_set = descriptor_pb2.FileDescriptorSet(file=[file_proto])
+    return Schema(
+        name=f"{PROTOBUF_PACKAGE}.{message_name}",
+        encoding="protobuf",
+        data=descriptor_set.SerializeToString(),
+    )
+
+
+def _varint(value: int) -> bytes:
+    """Encode an unsigned integer as a protobuf varint"""
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+class MessageEncoder:
+    """Creates scalar, joint state and text channels and encodes their messages.
+
+    With JSON encoding, messages are the dictionaries the schemas always
+    published: `{"value": ...}`, `{"joint0": ..., "joint5": ...}` and
+    `{"text": ...}`.
+
+    With protobuf encoding, the channels use these messages:
+
+        message Float { float value = 1; }
+        message FloatArray { repeated float values = 1; }
+        message Text { string text = 1; }
+
+    Joint states become a variable-length `FloatArray`. Messages are
+    written directly in the protobuf wire format, a whole batch at a time
+    with a few NumPy operations.
+    """
+
+    def __init__(self, encoding: str = "json"):
+        """Initialize the encoder
+
+        Args:
+            encoding: Message encoding, "json" or "protobuf"
+        """
+        if encoding not in MESSAGE_ENCODINGS:
+            raise ValueError(f"Unknown message encoding '{encoding}', expected one of {', '.join(MESSAGE_ENCODINGS)}")
+        self.encoding = encoding
+        self.binary = encoding == "protobuf"
+
+    def float_channel(self, topic: str) -> Channel:
+        """Create a channel for single float values"""
+        if self.binary:
+            schema = _protobuf_schema("Float", "value", descriptor_pb2.FieldDescriptorProto.TYPE_FLOAT)
+            return Channel(topic=topic, schema=schema, message_encoding="protobuf")
+        return Channel(topic=topic, schema=float_schema)
+
+    def joint_state_channel(self, topic: str) -> Channel:
+        """Create a channel for joint positions"""
+        if self.binary:
+            schema = _protobuf_schema("FloatArray", "values", descriptor_pb2.FieldDescriptorProto.TYPE_FLOAT,
+                                      repeated=True)
+            return Channel(topic=topic, schema=schema, message_encoding="protobuf")
+        return Channel(topic=topic, schema=joint_state_schema)
+
+    def text_channel(self, topic: str) -> Channel:
+        """Create a channel for text"""
+        if self.binary:
+            schema = _protobuf_schema("Text", "text", descriptor_pb2.FieldDescriptorProto.TYPE_STRING)
+            return Channel(topic=topic, schema=schema, message_encoding="protobuf")
+        return Channel(topic=topic, schema=language_instruction_schema)
+
+    def float_values(self, values: np.ndarray) -> List[Union[Dict[str, Any], bytes]]:
+        """Encode a float value per step
+
+        Args:
+            values: Array of shape (steps,)
+
+        Returns:
+            List with one message per step
+        """
+        if not self.binary:
+            return [{"value": value} for value in np.asarray(values).tolist()]
+        rows = np.empty((len(values), 5), dtype=np.uint8)
+        rows[:, 0] = _TAG_FIXED32
+        rows[:, 1:] = np.asarray(values, dtype="<f4").reshape(-1, 1).view(np.uint8)
+        return [row.tobytes() for row in rows]
+
+    def joint_states(self, positions: np.ndarray) -> List[Union[Dict[str, Any], bytes]]:
+        """Encode joint positions per step
+
+        Args:
+            positions: Array of shape (steps, joints)
+
+        Returns:
+            List with one message per step
+        """
+        if not self.binary:
+            return [{f"joint{i}": position for i, position in enumerate(row)} for row in np.asarray(positions).tolist()]
+        positions = np.asarray(positions, dtype="<f4")
+        header = self._array_header(positions.shape[1])
+        rows = np.empty((positions.shape[0], len(header) + positions.shape[1] * 4), dtype=np.uint8)
+        rows[:, :len(header)] = np.frombuffer(header, dtype=np.uint8)
+        rows[:, len(header):] = np.ascontiguousarray(positions).view(np.uint8)
+        return [row.tobytes() for row in rows]
+
+    def text(self, text: str) -> Union[Dict[str, Any], bytes]:
+        """Encode a text message"""
+        if not self.binary:
+            return {"text": text}
+        data = text.encode("utf-8")
+        return bytes([_TAG_LENGTH_DELIMITED]) + _varint(len(data)) + data
+
+    @staticmethod
+    def _array_header(length: int) -> bytes:
+        """Get the tag and length prefix of a packed float array"""
+        return bytes([_TAG_LENGTH_DELIMITED]) + _varint(length * 4)
@@ -0,0 +1,254 @@
+"""Per-stage timers and counters for profiling conversions"""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from foxglove import Channel
+from foxglove.schemas import CompressedImage, RawImage
+
+# Messages whose size is reported with `add_bytes()` by the code building
+# them, as encoding them again only to measure them would double their cost
+_IMAGE_MESSAGES = (RawImage, CompressedImage)
+
+
+def message_size(msg: Any) -> int:
+    """Estimate the serialized size of a message in bytes"""
+    if isinstance(msg, dict):
+        return len(json.dumps(msg).encode("utf-8"))
+    if isinstance(msg, (bytes, bytearray)):
+        return len(msg)
+    encode = getattr(msg, "encode", None)
+    return len(encode()) if encode is not None else 0
+
+
+class _NullStage:
+    """Context manager that does nothing, shared by all disabled stages."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullProfiler:
+    """Profiler that records nothing.
+
+    This is the default profiler of schemas and image publishers. Its
+    methods return immediately and `wrap()` returns channels unchanged, so
+    profiling costs next to nothing when it is disabled.
+    """
+
+    enabled = False
+
+    def stage(self, name: str) -> _NullStage:
+        return _NULL_STAGE
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    def add_time(self, name: str, seconds: float) -> None:
+        pass
+
+    def add_bytes(self, topic: str, size: int) -> None:
+        pass
+
+    def wrap(self, channels: Dict[str, Channel]) -> Dict[str, Channel]:
+        return channels
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class _Stage:
+    """Times one pass through a stage, nested in the stages entered before it."""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._stack.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        stack = self.profiler._stack
+        self.profiler._record(";".join(stack), elapsed)
+        stack.pop()
+        return False
+
+
+class _ProfiledChannel:
+    """Channel wrapper that times every log call and counts messages and bytes."""
+
+    def __init__(self, channel, profiler):
+        self._channel = channel
+        self._profiler = profiler
+        self._topic = channel.topic()
+        self._stage_name = f"log {self._topic}"
+
+    @property
+    def inner(self):
+        """Channel this wrapper logs to"""
+        return self._channel
+
+    def log(self, msg, *, log_time=None, **kwargs):
+        with _Stage(self._profiler, self._stage_name):
+            self._channel.log(msg, log_time=log_time, **kwargs)
+        size = 0 if isinstance(msg, _IMAGE_MESSAGES) else message_size(msg)
+        self._profiler.add_message(self._topic, size)
+
+    def __getattr__(self, name):
+        return getattr(self._channel, name)
+
+
+class Profiler:
+    """Collects per-stage times, counters and per-topic message sizes.
+
+    Stages nest: a stage entered while another one is active is recorded
+    under the path of both, e.g. `process_step;images;log /image`, which
+    maps directly onto a flame graph. Stages must be entered from the
+    converting thread; work done on other threads, such as image encoding,
+    is reported with `add_time()` as a top-level entry.
+
+    Pass a profiler to `convert_episode` to profile an episode, and read the
+    results with `report()`. Subclasses can override `stage()`, `count()`,
+    `add_time()` or `add_message()` to forward measurements elsewhere.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.topics = {}
+        self._stack = []
+        self._lock = threading.Lock()
+
+    def stage(self, name: str) -> _Stage:
+        """Time a stage, as `with profiler.stage("images"): ...`"""
+        return _Stage(self, name)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Increase a counter"""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """Add time spent outside the converting thread as a top-level stage"""
+        with self._lock:
+            self._record(name, seconds)
+
+    def add_message(self, topic: str, size: int) -> None:
+        """Count a message logged on a topic"""
+        stats = self.topics.setdefault(topic, {"messages": 0, "bytes": 0})
+        stats["messages"] += 1
+        stats["bytes"] += size
+
+    def add_bytes(self, topic: str, size: int) -> None:
+        """Add the size of a message counted by a wrapped channel, e.g. of an image where it is built"""
+        stats = self.topics.setdefault(topic, {"messages": 0, "bytes": 0})
+        stats["bytes"] += size
+
+    def wrap(self, channels: Dict[str, Channel]) -> Dict[str, Channel]:
+        """Wrap channels so that their log calls are timed and their messages counted
+
+        Args:
+            channels: Dictionary of channels returned by `setup_channels()`
+
+        Returns:
+            Dictionary of wrapped channels with the same keys
+        """
+        return {key: _ProfiledChannel(channel, self) for key, channel in channels.items()}
+
+    def report(self) -> Dict[str, Any]:
+        """Get the measurements as a JSON-serializable dictionary"""
+        return {
+            "stages": {path: dict(stats) for path, stats in sorted(self.stages.items())},
+            "counters": dict(self.counters),
+            "topics": {topic: dict(stats) for topic, stats in sorted(self.topics.items())},
+        }
+
+    def merge(self, report: Dict[str, Any]) -> None:
+        """Add the measurements of a report, e.g. of another episode"""
+        for path, stats in report.get("stages", {}).items():
+            totals = self.stages.setdefault(path, {"seconds": 0.0, "calls": 0})
+            totals["seconds"] += stats["seconds"]
+            totals["calls"] += stats["calls"]
+        for name, n in report.get("counters", {}).items():
+            self.count(name, n)
+        for topic, stats in report.get("topics", {}).items():
+            totals = self.topics.setdefault(topic, {"messages": 0, "bytes": 0})
+            totals["messages"] += stats["messages"]
+            totals["bytes"] += stats["bytes"]
+
+    def _record(self, path, seconds):
+        stats = self.stages.get(path)
+        if stats is None:
+            stats = self.stages[path] = {"seconds": 0.0, "calls": 0}
+        stats["seconds"] += seconds
+        stats["calls"] += 1
+
+
+def merge_reports(reports: Iterable[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Merge profiling reports, e.g. of all episodes of a batch"""
+    profiler = Profiler()
+    for report in reports:
+        if report:
+            profiler.merge(report)
+    return profiler.report()
+
+
+def folded_stacks(report: Dict[str, Any]) -> List[str]:
+    """Convert a report to collapsed stacks with self times in microseconds.
+
+    Every line is a `;`-separated stage path and the time spent in it
+    outside its child stages, the input format of flamegraph.pl, inferno
+    and speedscope.
+    """
+    stages = report["stages"]
+    self_time = {path: stats["seconds"] for path, stats in stages.items()}
+    for path, stats in stages.items():
+        parent = path.rpartition(";")[0]
+        if parent in self_time:
+            self_time[parent] -= stats["seconds"]
+    return [f"{path} {max(0, round(seconds * 1e6))}" for path, seconds in sorted(self_time.items())]
+
+
+def write_profile(report: Dict[str, Any], path: str) -> None:
+    """Write a report as JSON, and as collapsed stacks next to it with a `.folded` extension
+
+    Args:
+        report: Report returned by `Profiler.report()`
+        path: Path of the JSON file
+    """
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    folded_path = os.path.splitext(path)[0] + ".folded"
+    with open(folded_path, "w") as f:
+        f.write("\n".join(folded_stacks(report)) + "\n")
+    print(f"Profile saved to {path} and {folded_path}")
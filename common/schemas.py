@@ -14,45 +14,309 @@
 # limitations under the License.
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Type
+from typing import Callable, Dict, Any, List, Sequence, Type, Optional
 from foxglove import Channel
+import fnmatch
 import importlib
+import importlib.util
 import os
+import pkgutil
 
-# Common schema definitions
-language_instruction_schema = {
-    "type": "object",
-    "properties": {
-        "text": {"type": "string"}
-    }
-}
-
-float_schema = {
-    "type": "object",
-    "properties": {
-        "value": {
-            "type": "number",
-            "format": "float",
-        },
-    },
-}
-
-joint_state_schema = {
-    "type": "object",
-    "properties": {
-        "joint0": {"type": "number", "format": "float"},
-        "joint1": {"type": "number", "format": "float"},
-        "joint2": {"type": "number", "format": "float"},
-        "joint3": {"type": "number", "format": "float"},
-        "joint4": {"type": "number", "format": "float"},
-        "joint5": {"type": "number", "format": "float"},
-    },
-}
+from common.images import ImagePublisher
+from common.messages import MessageEncoder
+from common.profiling import NULL_PROFILER
+
+# Common JSON schema definitions, defined next to their protobuf counterparts
+from common.messages import language_instruction_schema, float_schema, joint_state_schema  # noqa: F401
+
+
+# Package holding one schema module per dataset, named after the dataset
+SCHEMA_PACKAGE = "common.dataset_schemas"
+
+# Modules of the schema package that are not dataset schemas
+_SHARED_SCHEMA_MODULES = ("default",)
+
+# Entry point group through which other packages can provide schemas, as
+# `dataset_name = "package.module:SchemaClass"`
+SCHEMA_ENTRY_POINT_GROUP = "coscene_converter.schemas"
+
+# Dataset name to schema class, filled by `register_schema`
+_SCHEMA_REGISTRY: Dict[str, Type['DatasetSchema']] = {}
+
+
+class UnknownDatasetError(ValueError):
+    """Raised when no schema is registered for a dataset."""
+
+
+def register_schema(*dataset_names: str) -> Callable[[Type['DatasetSchema']], Type['DatasetSchema']]:
+    """Class decorator registering a schema for one or more datasets
+    
+    A schema module in `common/dataset_schemas/` is named after the dataset
+    it handles, so the registry finds and imports it on first use:
+    
+        @register_schema("berkeley_autolab_ur5")
+        class BerkeleyAutolabUr5Schema(MappedSchema):
+            ...
+    
+    Args:
+        *dataset_names: Registered dataset names handled by the schema
+        
+    Returns:
+        The decorator, which returns the class unchanged
+    """
+    def decorator(schema_class):
+        for dataset_name in dataset_names:
+            registered = _SCHEMA_REGISTRY.get(dataset_name)
+            if registered is not None and registered is not schema_class:
+                raise ValueError(f"Dataset {dataset_name} already has the schema {registered.__name__}")
+            _SCHEMA_REGISTRY[dataset_name] = schema_class
+        return schema_class
+    return decorator
+
+
+def _schema_entry_points() -> Dict[str, Any]:
+    """Get the schema entry points of installed packages by dataset name, without loading them"""
+    from importlib.metadata import entry_points
+
+    return {entry_point.name: entry_point for entry_point in entry_points(group=SCHEMA_ENTRY_POINT_GROUP)}
+
+
+def available_schemas() -> List[str]:
+    """List the datasets that have a schema, without importing any schema module
+    
+    Returns:
+        Sorted dataset names
+    """
+    package = importlib.import_module(SCHEMA_PACKAGE)
+    names = set(_SCHEMA_REGISTRY)
+    names.update(
+        module.name for module in pkgutil.iter_modules(package.__path__)
+        if not module.name.startswith("_") and module.name not in _SHARED_SCHEMA_MODULES
+    )
+    names.update(_schema_entry_points())
+    return sorted(names)
+
+
+def schema_class_for_dataset(dataset_name: str) -> Type['DatasetSchema']:
+    """Get the schema class registered for a dataset
+    
+    Only the schema module named after the dataset is imported, once, or the
+    schema entry point of that name is loaded if there is no such module.
+    
+    Args:
+        dataset_name: Registered dataset name
+        
+    Returns:
+        The schema class
+        
+    Raises:
+        UnknownDatasetError: If no schema is registered for the dataset
+    """
+    schema_class = _SCHEMA_REGISTRY.get(dataset_name)
+    if schema_class is not None:
+        return schema_class
+    
+    module_name = f"{SCHEMA_PACKAGE}.{dataset_name}"
+    if dataset_name.isidentifier() and dataset_name not in _SHARED_SCHEMA_MODULES \
+            and importlib.util.find_spec(module_name) is not None:
+        importlib.import_module(module_name)
+        if dataset_name not in _SCHEMA_REGISTRY:
+            raise UnknownDatasetError(f"Schema module {module_name} does not register a schema for {dataset_name}")
+    else:
+        entry_point = _schema_entry_points().get(dataset_name)
+        if entry_point is None:
+            raise UnknownDatasetError(
+                f"No schema registered for dataset '{dataset_name}'. "
+                f"Available datasets: {', '.join(available_schemas())}"
+            )
+        register_schema(dataset_name)(entry_point.load())
+    return _SCHEMA_REGISTRY[dataset_name]
+
+
+def topic_selected(topic: str, topics: Optional[Sequence[str]] = None,
+                   exclude_topics: Optional[Sequence[str]] = None) -> bool:
+    """Check whether a topic passes topic filters
+
+    Args:
+        topic: Topic, e.g. "/joint_state"
+        topics: Topics or glob patterns such as "/depth_*" to keep, None to keep all topics
+        exclude_topics: Topics or glob patterns to drop, even if they match `topics`
+
+    Returns:
+        bool: Whether the topic is published
+    """
+    if topics and not any(fnmatch.fnmatchcase(topic, pattern) for pattern in topics):
+        return False
+    return not any(fnmatch.fnmatchcase(topic, pattern) for pattern in exclude_topics or ())
+
+
+def batch_length(batch: Dict[str, Any]) -> int:
+    """Get the number of steps in a batch of stacked step features"""
+    import tensorflow as tf
+
+    return len(tf.nest.flatten(batch)[0])
+
+
+class LatchedChannel:
+    """Channel wrapper that only logs messages differing from the previous one.
+    
+    Viewers keep showing the last message of a channel, so a value that is
+    constant for an episode, such as a language instruction, is published
+    once at its first step and again only when it changes.
+    """
+    
+    def __init__(self, channel: Channel):
+        self._channel = channel
+        self._last = None
+        self._has_last = False
+    
+    @property
+    def inner(self) -> Channel:
+        """Channel this wrapper logs to"""
+        return self._channel
+    
+    def log(self, msg: Any, *, log_time: Optional[int] = None, **kwargs) -> None:
+        if self._has_last and msg == self._last:
+            return
+        self._last = msg
+        self._has_last = True
+        self._channel.log(msg, log_time=log_time, **kwargs)
+    
+    def __getattr__(self, name):
+        return getattr(self._channel, name)
 
 
 class DatasetSchema(ABC):
     """Base class for dataset schemas"""
     
+    # Keys of channels that only publish when their message changes
+    latched_channels = ()
+    
+    # Step features, as paths such as "observation/image", that each topic
+    # is built from. Features of topics that are filtered out are not
+    # decoded; features no topic lists are always read
+    topic_features = {}
+    
+    def __init__(self, image_codecs: Optional[Dict[str, str]] = None, jpeg_quality: int = 90,
+                 image_passthrough: bool = False, message_encoding: str = "json", latch: bool = True,
+                 depth_format: str = "32FC1", depth_scale: float = 1000.0,
+                 image_transforms: Optional[Dict[str, Dict[str, Any]]] = None,
+                 topics: Optional[Sequence[str]] = None, exclude_topics: Optional[Sequence[str]] = None):
+        """Initialize the schema
+        
+        Args:
+            image_codecs: Dictionary mapping image topics (or "*" for all topics) to codecs
+            jpeg_quality: JPEG quality for compressed image topics
+            image_passthrough: Publish images read without decoding as their original encoded bytes
+            message_encoding: Encoding of scalar, joint state and text channels, "json" or "protobuf"
+            latch: Publish the channels in `latched_channels` only when their message changes
+            depth_format: Storage format of floating point depth images, "32FC1", "16UC1" or "png"
+            depth_scale: Number of 16-bit steps per metre of quantized depth images
+            image_transforms: Dictionary mapping image topics (or "*" for all topics) to crop, resize and
+                frame decimation settings, see `common.images.ImageTransform`
+            topics: Topics or glob patterns to publish, None for all topics
+            exclude_topics: Topics or glob patterns not to publish
+        """
+        self.images = ImagePublisher(image_codecs, jpeg_quality=jpeg_quality, passthrough=image_passthrough,
+                                     depth_format=depth_format, depth_scale=depth_scale,
+                                     transforms=image_transforms)
+        self.messages = MessageEncoder(message_encoding)
+        self.profiler = NULL_PROFILER
+        self.latch_enabled = latch
+        self.topics = list(topics or [])
+        self.exclude_topics = list(exclude_topics or [])
+        self._latched_values = {}
+    
+    @classmethod
+    def unused_features(cls, topics: Optional[Sequence[str]] = None,
+                        exclude_topics: Optional[Sequence[str]] = None) -> List[str]:
+        """Get the step features that no published topic is built from
+        
+        The data loader skips decoding them, see `topic_features`.
+        
+        Args:
+            topics: Topics or glob patterns to publish, None for all topics
+            exclude_topics: Topics or glob patterns not to publish
+            
+        Returns:
+            list: Paths of the unused step features, such as "observation/hand_image"
+        """
+        used, unused = set(), set()
+        for topic, features in cls.topic_features.items():
+            (used if topic_selected(topic, topics, exclude_topics) else unused).update(features)
+        return sorted(unused - used)
+    
+    def select_channels(self, channels: Dict[str, Channel]) -> Dict[str, Channel]:
+        """Drop the channels whose topic is filtered out
+        
+        The channels that are dropped are closed, so the MCAP file has no
+        trace of them, and schemas skip the work of channel keys that are
+        missing.
+        
+        Args:
+            channels: Dictionary of channels returned by `setup_channels()`
+            
+        Returns:
+            Dictionary of the channels that are published
+        """
+        if not self.topics and not self.exclude_topics:
+            return channels
+        selected = {}
+        for key, channel in channels.items():
+            if topic_selected(channel.topic(), self.topics, self.exclude_topics):
+                selected[key] = channel
+            else:
+                channel.close()
+        if not selected:
+            print(f"No topic of {self.__class__.__name__} passes the topic filters")
+        return selected
+    
+    def latch(self, channels: Dict[str, Channel]) -> Dict[str, Channel]:
+        """Wrap the channels listed in `latched_channels` so they only publish changes
+        
+        Args:
+            channels: Dictionary of channels returned by `setup_channels()`
+            
+        Returns:
+            Dictionary of channels with the same keys
+        """
+        if not self.latch_enabled:
+            return channels
+        return {
+            key: LatchedChannel(channel) if key in self.latched_channels else channel
+            for key, channel in channels.items()
+        }
+    
+    def changed(self, key: str, value: Any) -> bool:
+        """Check whether the raw value of a latched channel changed since the previous step
+        
+        Schemas can call this before decoding a value, so repeated values
+        are neither decoded nor encoded. For channels that are not latched
+        it always returns True.
+        
+        Args:
+            key: Channel key
+            value: Raw value of the step, e.g. the bytes of a string tensor
+            
+        Returns:
+            bool: Whether the value has to be published
+        """
+        if not self.latch_enabled or key not in self.latched_channels:
+            return True
+        if key in self._latched_values and self._latched_values[key] == value:
+            return False
+        self._latched_values[key] = value
+        return True
+    
+    def set_profiler(self, profiler) -> None:
+        """Report the time spent in each stage of `process_step` to a profiler
+        
+        Args:
+            profiler: A `common.profiling.Profiler`
+        """
+        self.profiler = profiler
+        self.images.profiler = profiler
+    
     @abstractmethod
     def setup_channels(self) -> Dict[str, Channel]:
         """Set up channels for the dataset
@@ -63,63 +327,67 @@ class DatasetSchema(ABC):
         pass
     
     @abstractmethod
-    def process_step(self, step: Dict[str, Any], channels: Dict[str, Channel], verbose: bool = False) -> None:
+    def process_step(self, step: Dict[str, Any], channels: Dict[str, Channel], verbose: bool = False,
+                     log_time: Optional[int] = None) -> None:
         """Process a single step of data
         
         Args:
             step: Step data dictionary
             channels: Dictionary of channels to publish to
             verbose: Whether to print step information
+            log_time: Log time of the step's messages in nanoseconds, None for the current time
         """
         if verbose:
             self.print_step_info(step, 0) 
         pass
     
+    def process_steps(self, batch: Dict[str, Any], channels: Dict[str, Channel], verbose: bool = False,
+                      log_times: Optional[List[int]] = None) -> None:
+        """Process a batch of steps
+        
+        The batch holds every step feature stacked along a leading axis, as
+        produced by `tf.data.Dataset.batch()`. Schemas can override this to
+        convert each feature to NumPy once per batch and slice the messages
+        out of the arrays. This default implementation slices out each step
+        and calls `process_step()`.
+        
+        Args:
+            batch: Dictionary of stacked step features
+            channels: Dictionary of channels to publish to
+            verbose: Whether to print step information
+            log_times: Log time of each step in nanoseconds, None for the current time
+        """
+        import tensorflow as tf
+
+        if log_times is None:
+            log_times = [None] * batch_length(batch)
+        for i, log_time in enumerate(log_times):
+            step = tf.nest.map_structure(lambda feature: feature[i], batch)
+            self.process_step(step, channels, verbose, log_time)
+    
+    def finish(self) -> None:
+        """Publish any messages that are still being processed at the end of an episode"""
+        self.images.flush()
+    
+    def close(self) -> None:
+        """Release resources held by the schema"""
+        self.images.close()
+    
     @classmethod
-    def get_schema_for_dataset(cls, dataset_name: str) -> 'DatasetSchema':
+    def get_schema_for_dataset(cls, dataset_name: str, **schema_options) -> 'DatasetSchema':
         """Get the appropriate schema for a dataset
         
         Args:
             dataset_name: Name of the dataset
+            **schema_options: Keyword arguments passed to the schema constructor
             
         Returns:
             DatasetSchema instance for the dataset
-        """
-        # Convert dataset name to schema class name
-        parts = dataset_name.split('_')
-        class_name = ''.join(part.capitalize() for part in parts) + 'Schema'
-        
-        print(f"Searching for schema class {class_name}")
-        # Try to import the schema class
-        try:
-            # First try to find a specific schema module
-            module_name = f"common.dataset_schemas.{dataset_name}"
-            try:
-                module = importlib.import_module(module_name)
-                if hasattr(module, class_name):
-                    schema_class = getattr(module, class_name)
-                    return schema_class()
-            except ImportError:
-                # Module not found, try next approach
-                pass
-            
-            # Try to find the class in any of the schema modules
-            from common.dataset_schemas import default, berkeley_autolab_ur5, stanford_robocook_converted_externally_to_rlds
-            
-            for module in [default, berkeley_autolab_ur5, stanford_robocook_converted_externally_to_rlds]:
-                if hasattr(module, class_name):
-                    schema_class = getattr(module, class_name)
-                    return schema_class()
             
-            # If not found, use default schema
-            print(f"No specific schema found for {dataset_name}, using DefaultSchema")
-            from common.dataset_schemas.default import DefaultSchema
-            return DefaultSchema()
-            
-        except Exception as e:
-            print(f"Error loading schema for {dataset_name}: {e}")
-            from common.dataset_schemas.default import DefaultSchema
-            return DefaultSchema()
+        Raises:
+            UnknownDatasetError: If no schema is registered for the dataset
+        """
+        return schema_class_for_dataset(dataset_name)(**schema_options)
     
     def print_step_info(self, step: Dict[str, Any], step_index: int) -> None:
         """Print information about a step.
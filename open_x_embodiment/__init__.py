@@ -13,7 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from open_x_embodiment.data_loader import load_dataset, print_step_info
+import importlib
 
 __all__ = [
     'load_dataset',
@@ -22,5 +22,24 @@ __all__ = [
     'batch_convert_episodes',
 ]
 
-# 延迟导入，避免循环引用
-from open_x_embodiment.converter import convert_episode, batch_convert_episodes
\ No newline at end of file
+# Module of each public name. They are imported on first access, so that
+# importing a submodule such as `open_x_embodiment.sharding` doesn't load
+# TensorFlow; this also avoids circular imports with the converter.
+_EXPORTS = {
+    'load_dataset': 'open_x_embodiment.data_loader',
+    'print_step_info': 'open_x_embodiment.data_loader',
+    'convert_episode': 'open_x_embodiment.converter',
+    'batch_convert_episodes': 'open_x_embodiment.converter',
+}
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
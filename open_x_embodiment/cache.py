@@ -0,0 +1,323 @@
+"""Local on-disk cache for remote TFDS datasets."""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "coscene-converter")
+
+# Small metadata files needed to construct a builder
+METADATA_FILES = ("dataset_info.json", "features.json")
+
+_COPY_CHUNK_SIZE = 8 * 1024 * 1024
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(size):
+    """Parse a size such as "512M" or "50G" into bytes.
+
+    Args:
+        size: Size as a number of bytes or with a K, M, G or T suffix
+
+    Returns:
+        int: Size in bytes
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", str(size), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {size}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def _process_alive(pid):
+    """Check whether a process of this machine is still running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, as another user
+        return True
+    return True
+
+
+class CacheMissError(RuntimeError):
+    """Raised when a file is not cached and the cache is offline."""
+
+
+class DatasetCache:
+    """Content-addressed local mirror of dataset directories.
+
+    Files are stored once under `blobs/<sha256>` and exposed through
+    per-dataset directories of symlinks, so `tfds.builder_from_directory`
+    can read a dataset from local disk. Metadata files are mirrored when a
+    dataset is first opened, TFRecord shards when an episode range that
+    needs them is opened. When the cache grows beyond `max_bytes`, the
+    least recently used blobs are evicted, except those leased by a live
+    process: every process leases the blobs of the range it last opened,
+    so workers sharing a cache never evict each other's shards.
+
+    An index of remote paths, blob sizes, sizes of source files looked up
+    without downloading them, and access times is kept in `index.json`, guarded by a file lock so several worker processes can
+    share one cache.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=None, offline=False):
+        """Initialize the cache
+
+        Args:
+            cache_dir: Root directory of the cache
+            max_bytes: Maximum total size of cached blobs, None for no limit
+            offline: Never access the source, fail on files that are not cached
+        """
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.blob_dir = os.path.join(self.cache_dir, "blobs")
+        self.view_dir = os.path.join(self.cache_dir, "datasets")
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.view_dir, exist_ok=True)
+
+    def builder(self, source_dir, start_episode=None, end_episode=None, split="train"):
+        """Get a dataset builder that reads a source directory from the cache
+
+        Args:
+            source_dir: Builder directory, e.g. a gs:// path
+            start_episode: First episode that will be read, None for the whole split
+            end_episode: Last episode that will be read (inclusive), None for the whole split
+            split: Split the episode range refers to
+
+        Returns:
+            Dataset builder backed by the local mirror
+        """
+        import tensorflow_datasets as tfds
+
+        local_dir = self._local_dir(source_dir)
+        pinned = set()
+        for filename in METADATA_FILES:
+            pinned.add(self._mirror(source_dir, local_dir, filename, required=filename == "dataset_info.json"))
+
+        b = tfds.builder_from_directory(builder_dir=local_dir)
+        split_info = b.info.splits[split]
+        for filename in self._shards_for_range(split_info, start_episode, end_episode):
+            pinned.add(self._mirror(source_dir, local_dir, filename))
+
+        self._evict(pinned - {None})
+        return b
+
+    def file_sizes(self, source_dir, filenames):
+        """Get the sizes of files of a source directory without downloading them
+
+        Sizes of cached files are read from the cache index. Other files are
+        looked up at the source, and their sizes are remembered so that an
+        offline cache can answer for them later.
+
+        Args:
+            source_dir: Source directory, e.g. a gs:// path
+            filenames: Names of the files in the source directory
+
+        Returns:
+            list: Size of each file in bytes
+
+        Raises:
+            CacheMissError: If the size of a file is not known and the cache is offline
+        """
+        source_paths = [f"{source_dir.rstrip('/')}/{filename}" for filename in filenames]
+        with self._index() as index:
+            known = index.get("sizes", {})
+            sizes = []
+            for source_path in source_paths:
+                blob = index["blobs"].get(index["files"].get(source_path))
+                sizes.append(blob["size"] if blob is not None else known.get(source_path))
+
+        missing = [source_path for source_path, size in zip(source_paths, sizes) if size is None]
+        if not missing:
+            return sizes
+        if self.offline:
+            raise CacheMissError(f"Sizes of {len(missing)} files of {source_dir} are not cached and the cache is offline")
+        import tensorflow as tf
+
+        looked_up = {source_path: tf.io.gfile.stat(source_path).length for source_path in missing}
+        with self._index() as index:
+            index.setdefault("sizes", {}).update(looked_up)
+        return [looked_up.get(source_path, size) for source_path, size in zip(source_paths, sizes)]
+
+    @staticmethod
+    def _shards_for_range(split_info, start_episode, end_episode):
+        """Get the shard files holding an episode range of a split"""
+        start_episode = 0 if start_episode is None else start_episode
+        end_episode = split_info.num_examples - 1 if end_episode is None else end_episode
+
+        filenames = []
+        offset = 0
+        for filename, shard_length in zip(split_info.filenames, split_info.shard_lengths):
+            if offset <= end_episode and start_episode < offset + shard_length:
+                filenames.append(filename)
+            offset += shard_length
+        return filenames
+
+    def _local_dir(self, source_dir):
+        """Get the local directory that mirrors a source directory"""
+        relative = re.sub(r"^[a-z0-9]+://", "", source_dir.rstrip("/"))
+        local_dir = os.path.join(self.view_dir, *relative.lstrip("/").split("/"))
+        os.makedirs(local_dir, exist_ok=True)
+        return local_dir
+
+    def _mirror(self, source_dir, local_dir, filename, required=True):
+        """Make a file of the source directory available in the local mirror
+
+        Returns:
+            Blob digest of the file, or None if an optional file does not exist
+        """
+        source_path = f"{source_dir.rstrip('/')}/{filename}"
+        link_path = os.path.join(local_dir, filename)
+
+        with self._index() as index:
+            digest = index["files"].get(source_path)
+            if digest is not None and os.path.exists(self._blob_path(digest)):
+                self._link(digest, link_path, index)
+                self._lease(digest, index)
+                index["blobs"][digest]["last_access"] = time.time()
+                return digest
+
+        if self.offline:
+            if not required:
+                return None
+            raise CacheMissError(f"{source_path} is not cached and the cache is offline")
+        import tensorflow as tf
+
+        if not required and not tf.io.gfile.exists(source_path):
+            return None
+
+        print(f"Caching {source_path}")
+        digest, size, tmp_path = self._download(source_path)
+        with self._index() as index:
+            blob_path = self._blob_path(digest)
+            if os.path.exists(blob_path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, blob_path)
+            index["files"][source_path] = digest
+            blob = index["blobs"].setdefault(digest, {"size": size, "links": []})
+            blob["last_access"] = time.time()
+            self._link(digest, link_path, index)
+            self._lease(digest, index)
+        return digest
+
+    def _download(self, source_path):
+        """Copy a source file into a temporary file, hashing its content"""
+        import tensorflow as tf
+
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, prefix=".download-")
+        try:
+            with tf.io.gfile.GFile(source_path, "rb") as src, os.fdopen(fd, "wb") as dst:
+                while True:
+                    chunk = src.read(_COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+                    dst.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return sha.hexdigest(), size, tmp_path
+
+    def _link(self, digest, link_path, index):
+        """Point a file of a local mirror at a blob"""
+        blob_path = self._blob_path(digest)
+        if os.path.realpath(link_path) != blob_path:
+            if os.path.lexists(link_path):
+                os.remove(link_path)
+            os.symlink(blob_path, link_path)
+        links = index["blobs"][digest]["links"]
+        if link_path not in links:
+            links.append(link_path)
+
+    @staticmethod
+    def _lease(digest, index):
+        """Lease a blob to this process, under the index lock it was linked under"""
+        leases = index.setdefault("leases", {}).setdefault(str(os.getpid()), [])
+        if digest not in leases:
+            leases.append(digest)
+
+    def _evict(self, pinned):
+        """Evict least recently used blobs until the cache fits its size limit
+
+        Args:
+            pinned: Blobs of the range this process opened, which replace its previous leases
+        """
+        with self._index() as index:
+            leases = index.setdefault("leases", {})
+            leases[str(os.getpid())] = sorted(pinned)
+            for pid in list(leases):
+                if not _process_alive(int(pid)):
+                    del leases[pid]
+            if self.max_bytes is None:
+                return
+            pinned = {digest for digests in leases.values() for digest in digests}
+            blobs = index["blobs"]
+            total = sum(blob["size"] for blob in blobs.values())
+            for digest in sorted(blobs, key=lambda d: blobs[d]["last_access"]):
+                if total <= self.max_bytes:
+                    break
+                if digest in pinned:
+                    continue
+                blob = blobs.pop(digest)
+                for link_path in blob["links"]:
+                    if os.path.lexists(link_path):
+                        os.remove(link_path)
+                if os.path.exists(self._blob_path(digest)):
+                    os.remove(self._blob_path(digest))
+                index["files"] = {path: d for path, d in index["files"].items() if d != digest}
+                total -= blob["size"]
+            if total > self.max_bytes:
+                print(f"Warning: cache holds {total} bytes needed by running conversions, more than its {self.max_bytes} byte limit")
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest)
+
+    @contextlib.contextmanager
+    def _index(self):
+        """Lock, load and afterwards save the cache index"""
+        with open(os.path.join(self.cache_dir, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(self.index_path):
+                    with open(self.index_path) as f:
+                        index = json.load(f)
+                else:
+                    index = {"files": {}, "blobs": {}}
+                yield index
+                tmp_path = self.index_path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(index, f)
+                os.replace(tmp_path, self.index_path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
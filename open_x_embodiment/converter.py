@@ -13,21 +13,149 @@
 # limitations under the License.
 
 import foxglove
+import itertools
 import time
 import os
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from common.schemas import DatasetSchema
+import numpy as np
 
+from common.profiling import NULL_PROFILER, Profiler
+from common.schemas import DatasetSchema, batch_length, schema_class_for_dataset
+from open_x_embodiment.live import LivePreview
+from open_x_embodiment.manifest import MANIFEST_FILENAME, Manifest, file_sha256
+from open_x_embodiment.memory import estimate_step_bytes, plan_memory
+from open_x_embodiment.pipeline import ConversionPipeline
+from open_x_embodiment.writer_options import mcap_write_options
 
-def convert_episode(episode, output_file, dataset_name=None, control_rate_hz=5, live_preview=False, verbose=False):
+# Suffix of MCAP files that are still being written
+PARTIAL_SUFFIX = ".partial"
+
+# Step features holding dataset-provided timestamps in seconds
+TIMESTAMP_KEYS = ("timestamp",)
+
+# Timestamps at or above this many seconds are absolute Unix times
+_EPOCH_THRESHOLD_SEC = 1e9
+
+
+def _dataset_timestamp(step):
+    """Get the timestamp of a step in seconds, if the dataset provides one."""
+    for container in (step, step.get("observation", {})):
+        for key in TIMESTAMP_KEYS:
+            if key in container:
+                return float(np.asarray(container[key]))
+    return None
+
+
+def step_log_time(step, step_idx, start_time_ns, control_rate_hz):
+    """Get the log time of a step in nanoseconds.
+    
+    Dataset-provided timestamps are used when a step has one: absolute Unix
+    times as they are, relative times as an offset from the episode start.
+    Otherwise steps are spaced evenly at the control rate, so the result
+    only depends on the step index and not on how fast conversion runs.
+    
+    Args:
+        step: Step data dictionary
+        step_idx: Index of the step in the episode
+        start_time_ns: Log time of the episode start in nanoseconds
+        control_rate_hz: Control rate of the dataset in Hz
+        
+    Returns:
+        int: Log time in nanoseconds
+    """
+    timestamp = _dataset_timestamp(step)
+    if timestamp is None:
+        return start_time_ns + round(step_idx * 1e9 / control_rate_hz)
+    if timestamp >= _EPOCH_THRESHOLD_SEC:
+        return round(timestamp * 1e9)
+    return start_time_ns + round(timestamp * 1e9)
+
+
+def batch_log_times(batch, first_step_idx, start_time_ns, control_rate_hz, step_stride=1):
+    """Get the log times of a batch of steps in nanoseconds.
+    
+    Vectorized version of `step_log_time` for stacked step features.
+    
+    Args:
+        batch: Dictionary of stacked step features
+        first_step_idx: Index of the first step of the batch in the episode
+        start_time_ns: Log time of the episode start in nanoseconds
+        control_rate_hz: Control rate of the dataset in Hz
+        step_stride: Number of episode steps between consecutive steps of the batch
+        
+    Returns:
+        list: Log time of each step in nanoseconds
+    """
+    timestamps = None
+    for container in (batch, batch.get("observation", {})):
+        for key in TIMESTAMP_KEYS:
+            if timestamps is None and key in container:
+                timestamps = np.asarray(container[key], dtype=np.float64).reshape(-1)
+    
+    if timestamps is None:
+        step_idx = first_step_idx + np.arange(batch_length(batch)) * step_stride
+        return (start_time_ns + np.round(step_idx * 1e9 / control_rate_hz).astype(np.int64)).tolist()
+    log_times = np.round(timestamps * 1e9).astype(np.int64)
+    return np.where(timestamps >= _EPOCH_THRESHOLD_SEC, log_times, start_time_ns + log_times).tolist()
+
+
+def convert_episode(episode, output_file, dataset_name=None, control_rate_hz=5, live_preview=False, verbose=False,
+                    schema_options=None, start_time=0.0, live_buffer_size=1024, profiler=None, step_batch_size=32,
+                    pipeline=True, writer_options=None, memory_limit=None, every_nth_step=1):
     """Convert an episode to MCAP format and save to file.
     
+    With live preview, the episode is still converted at full speed into the
+    MCAP file, while its messages are replayed to a WebSocket server at the
+    pace of their log times.
+    
+    The episode is written to a temporary file next to `output_file` that
+    is renamed into place only once conversion succeeded, so `output_file`
+    is never left truncated by a failed or interrupted run.
+    
+    Steps read from a `tf.data` dataset are batched, so the schema can
+    convert each feature to NumPy once per batch in `process_steps()`.
+    
+    With the pipeline enabled, a reader thread reads and decodes the next
+    steps and a writer thread writes logged messages to the MCAP file while
+    the schema processes the current steps (see `ConversionPipeline`). The
+    output is the same as without it.
+    
+    Steps are pulled lazily from the episode's `steps` dataset and released
+    once their messages are written. With a memory limit, the batch size
+    and the pipeline and image encoder queues are sized from the decoded
+    size of the first step so that the steps and messages buffered at once
+    stay below the limit, however long the episode is (see `plan_memory`).
+    
+    With step decimation, only every nth step is converted, at the log time
+    it has in the full episode. Topics the schema options don't select are
+    not created (see `DatasetSchema.select_channels`).
+    
+    With a profiler, the time spent reading steps, in every stage of the
+    schema, in every channel's log calls and in closing the writer is
+    recorded, together with the messages and bytes of every topic.
+    
     Args:
         episode: The episode data
         output_file: Path to save the MCAP file
         dataset_name: Name of the dataset
-        control_rate_hz: Conversion rate in Hz
+        control_rate_hz: Control rate in Hz, used to timestamp steps and pace the live preview
         live_preview: Whether to show live preview
+        verbose: Whether to print step information
+        schema_options: Keyword arguments for the dataset schema, e.g. image codecs
+        start_time: Log time of the first step in seconds since the Unix epoch
+        live_buffer_size: Maximum number of messages buffered for the live preview
+        profiler: A `common.profiling.Profiler` to record stage times in, None to disable profiling
+        step_batch_size: Number of steps handed to the schema at once, 1 to process steps one by one
+        pipeline: Whether to read, process and write steps on separate threads
+        writer_options: Keyword arguments for `mcap_write_options`, e.g. the chunk compression
+        memory_limit: Memory ceiling of the buffered steps and messages in bytes, None for no limit
+        every_nth_step: Convert only every nth step of the episode, 1 to convert all steps
+        
+    Returns:
+        int: Number of steps converted
     """
     # Ensure output directory exists
     os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
@@ -37,74 +165,414 @@ def convert_episode(episode, output_file, dataset_name=None, control_rate_hz=5,
         dataset_name = os.path.basename(output_file).split('_episode_')[0]
     
     # Get dataset schema
-    schema = DatasetSchema.get_schema_for_dataset(dataset_name)
+    schema = DatasetSchema.get_schema_for_dataset(dataset_name, **(schema_options or {}))
     print(f"Using schema for dataset {dataset_name}: {schema.__class__.__name__}")
+    profiler = profiler or NULL_PROFILER
+    schema.set_profiler(profiler)
+    
+    steps = episode["steps"]
+    if every_nth_step > 1:
+        # Skipped steps are not batched, converted to NumPy or processed
+        steps = steps.shard(every_nth_step, 0) if hasattr(steps, "shard") else \
+            itertools.islice(steps, 0, None, every_nth_step)
+    pipeline_options = {}
+    if memory_limit:
+        step_bytes, largest_feature_bytes, steps = estimate_step_bytes(steps)
+        plan = plan_memory(memory_limit, step_bytes, largest_feature_bytes, step_batch_size, schema.images.max_pending)
+        step_batch_size = plan["step_batch_size"]
+        schema.images.max_pending = plan["max_pending_images"]
+        pipeline_options = {"read_queue_size": plan["read_queue_size"], "write_queue_bytes": plan["write_queue_bytes"]}
     
-    # Create writer or server
-    writer = None
-    server = None
+    # Create writer and live preview
+    partial_file = output_file + PARTIAL_SUFFIX
+    writer = foxglove.open_mcap(
+        partial_file, allow_overwrite=True, writer_options=mcap_write_options(**(writer_options or {}))
+    )
+    preview = None
     
     if live_preview:
-        server = foxglove.start_server()
-    else:
-        writer = foxglove.open_mcap(output_file)
+        preview = LivePreview(buffer_size=live_buffer_size)
+        preview.start()
     
     # 使用模式设置通道
-    channels = schema.setup_channels()
+    channels = schema.select_channels(schema.setup_channels())
+    executor = None
+    if pipeline:
+        # Innermost, so that only the MCAP writer runs on the writer thread
+        executor = ConversionPipeline(profiler=profiler, **pipeline_options)
+        channels = executor.wrap(channels)
+    channels = profiler.wrap(channels)
+    if preview:
+        channels = preview.tap(channels)
+    # Outermost, so that messages that are not published are not counted or previewed
+    channels = schema.latch(channels)
     
+    start_time_ns = round(start_time * 1e9)
+    num_steps = 0
     try:
-        for i, step in enumerate(episode["steps"]):
-            schema.process_step(step, channels, verbose)
-            
-            if live_preview:
-                time.sleep(1 / control_rate_hz)
+        if step_batch_size > 1 and hasattr(steps, "batch"):
+            batches = steps.batch(step_batch_size)
+            batches = iter(executor.read(batches) if executor else batches)
+            while True:
+                # Reading a batch includes decoding its steps
+                with profiler.stage("read"):
+                    batch = next(batches, None)
+                if batch is None:
+                    break
+                log_times = batch_log_times(batch, num_steps * every_nth_step, start_time_ns, control_rate_hz,
+                                            every_nth_step)
+                with profiler.stage("process_steps"):
+                    schema.process_steps(batch, channels, verbose, log_times)
+                num_steps += len(log_times)
+                # Release the batch before reading the next one
+                batch = None
+        else:
+            steps = iter(executor.read(steps) if executor else steps)
+            while True:
+                # Reading a step includes decoding it
+                with profiler.stage("read"):
+                    step = next(steps, None)
+                if step is None:
+                    break
+                log_time = step_log_time(step, num_steps * every_nth_step, start_time_ns, control_rate_hz)
+                with profiler.stage("process_step"):
+                    schema.process_step(step, channels, verbose, log_time)
+                num_steps += 1
+                step = None
+        
+        # Publish images that are still being encoded
+        with profiler.stage("finish"):
+            schema.finish()
+        if executor:
+            with profiler.stage("flush_pipeline"):
+                executor.flush()
     
     except Exception as e:
         print(f"Error during convertion: {e}")
+        raise
     finally:
-        if server:
-            server.stop()
-            print("Server stopped.")
-        if writer:
+        if executor:
+            executor.close()
+        schema.close()
+        with profiler.stage("close_writer"):
             writer.close()
+        profiler.count("steps", num_steps)
+        if sys.exc_info()[0] is None:
+            os.replace(partial_file, output_file)
             print(f"MCAP file saved to {output_file}")
+        elif os.path.exists(partial_file):
+            os.remove(partial_file)
+        if preview:
+            # Let the viewer catch up unless conversion failed
+            preview.stop(drain=sys.exc_info()[0] is None)
+            print("Server stopped.")
+    
+    return num_steps
 
 
-def batch_convert_episodes(dataset_name, start_episode, end_episode, output_dir="mcap_files", verbose=False):
+def _shard_episodes(episodes, num_shards, sizes=None):
+    """Split episode numbers into contiguous shards of near-equal size.
+    
+    Gaps in the episode numbers, e.g. episodes skipped when resuming, always
+    start a new shard, so every shard can be streamed as one range.
+    
+    Args:
+        episodes: Episode numbers to convert
+        num_shards: Number of shards to aim for
+        sizes: Size of each episode, in the order of the sorted episode numbers, e.g. from an
+            `EpisodeIndex`; None to balance shards by episode count
+        
+    Returns:
+        list: List of (start, end) tuples, both inclusive
+    """
+    episodes = sorted(episodes)
+    if not episodes:
+        return []
+    if sizes is None:
+        # At most the rounded-up share of episodes per shard
+        sizes = [1.0] * len(episodes)
+        shard_size = -(-len(episodes) // max(1, num_shards))
+        overlap = 1.0
+    else:
+        # An episode joins the shard its midpoint falls into
+        sizes = [float(size) for size in sizes]
+        shard_size = sum(sizes) / max(1, num_shards)
+        overlap = 0.5
+    
+    shards = []
+    shard_total = 0.0
+    for episode_num, size in zip(episodes, sizes):
+        if shards and episode_num == shards[-1][1] + 1 and shard_total + size * overlap <= shard_size:
+            shards[-1][1] = episode_num
+            shard_total += size
+        else:
+            shards.append([episode_num, episode_num])
+            shard_total = size
+    return [tuple(shard) for shard in shards]
+
+
+def _new_episode_result(dataset_name, episode_num, output_dir):
+    """Create the result record of a single episode in a batch."""
+    return {
+        "dataset": dataset_name,
+        "episode": episode_num,
+        "output_file": os.path.join(output_dir, f"{dataset_name}_episode_{episode_num}.mcap"),
+        "status": "converted",
+        "source_shard": None,
+        "source_offset": None,
+        "output_size": 0,
+        "sha256": None,
+        "steps": 0,
+        "duration": 0.0,
+        "error": None,
+    }
+
+
+def _convert_episode_range(dataset_name, start_episode, end_episode, output_dir, verbose=False, schema_options=None,
+                           control_rate_hz=5, start_time=0.0, source_options=None, profile=False, step_batch_size=32,
+                           pipeline=True, writer_options=None, manifest_name=MANIFEST_FILENAME, memory_limit=None,
+                           every_nth_step=1):
+    """Convert a contiguous range of episodes and report per-episode results.
+    
+    This is the unit of work of a batch worker. It loads its own dataset
+    builder and streams its range in a single pass, and every episode gets
+    its own MCAP writer and schema instance through `convert_episode`, so
+    workers share no mutable state. Image decoding is skipped when the
+    schema publishes images in passthrough mode, and step features used
+    only by topics the schema options don't select are not decoded at all.
+    Every result is appended to
+    the manifest in `output_dir` as soon as the episode is done.
+    
+    Args:
+        dataset_name: Name of the dataset
+        start_episode: Starting episode number
+        end_episode: Ending episode number (inclusive)
+        output_dir: Directory to save MCAP files
+        verbose: Whether to print step information
+        schema_options: Keyword arguments for the dataset schema
+        control_rate_hz: Control rate in Hz, used to timestamp steps
+        start_time: Log time of the first step of every episode in seconds since the Unix epoch
+        source_options: Keyword arguments for `load_builder`, e.g. the cache directory
+        profile: Add the profiling report of every episode to its result under "profile"
+        step_batch_size: Number of steps handed to the schema at once
+        pipeline: Whether to read, process and write steps on separate threads
+        writer_options: Keyword arguments for `mcap_write_options`
+        manifest_name: Name of the manifest file in `output_dir`
+        memory_limit: Memory ceiling of the buffered steps and messages of an episode in bytes; also stops
+            episodes from being read ahead
+        every_nth_step: Convert only every nth step of each episode
+        
+    Returns:
+        list: One result dictionary per episode, ordered by episode number
+    """
+    from open_x_embodiment.data_loader import load_builder, iter_episodes, episode_source
+    
+    manifest = Manifest(output_dir, manifest_name)
+    results = []
+    pending = set(range(start_episode, end_episode + 1))
+    read_error = None
+    
+    # Process each episode as it is streamed from the dataset
+    skip_image_decoding = (schema_options or {}).get("image_passthrough", False)
+    drop_features = schema_class_for_dataset(dataset_name).unused_features(
+        (schema_options or {}).get("topics"), (schema_options or {}).get("exclude_topics")
+    )
+    read_start = time.perf_counter()
+    try:
+        # Load dataset builder once
+        b = load_builder(dataset_name, start_episode, end_episode, **(source_options or {}))
+        
+        # With a memory limit, don't read the next episode records while converting one
+        prefetch = 0 if memory_limit else None
+        for episode_num, episode in iter_episodes(b, start_episode, end_episode, skip_image_decoding=skip_image_decoding,
+                                                  prefetch=prefetch, drop_features=drop_features):
+            print(f"Processing episode {episode_num}")
+            pending.discard(episode_num)
+            result = _new_episode_result(dataset_name, episode_num, output_dir)
+            result["source_shard"], result["source_offset"] = episode_source(b, episode_num)
+            
+            profiler = Profiler() if profile else None
+            try:
+                result["steps"] = convert_episode(
+                    episode,
+                    result["output_file"],
+                    dataset_name=dataset_name,
+                    control_rate_hz=control_rate_hz,
+                    verbose=verbose,
+                    schema_options=schema_options,
+                    start_time=start_time,
+                    profiler=profiler,
+                    step_batch_size=step_batch_size,
+                    pipeline=pipeline,
+                    writer_options=writer_options,
+                    memory_limit=memory_limit,
+                    every_nth_step=every_nth_step,
+                )
+                result["output_size"] = os.path.getsize(result["output_file"])
+                result["sha256"] = file_sha256(result["output_file"])
+            except Exception as e:
+                print(f"Error processing episode {episode_num}: {e}")
+                result["status"] = "failed"
+                result["error"] = str(e)
+            
+            # Includes the time spent reading the episode
+            result["duration"] = time.perf_counter() - read_start
+            if profiler is not None:
+                result["profile"] = profiler.report()
+            manifest.record(result)
+            results.append(result)
+            read_start = time.perf_counter()
+    except Exception as e:
+        print(f"Error reading episodes {start_episode}-{end_episode}: {e}")
+        read_error = str(e)
+    
+    # Episodes that were never yielded
+    for episode_num in sorted(pending):
+        result = _new_episode_result(dataset_name, episode_num, output_dir)
+        if read_error is None:
+            print(f"Episode {episode_num} not found in dataset.")
+            result["status"] = "missing"
+        else:
+            result["status"] = "failed"
+            result["error"] = read_error
+        manifest.record(result)
+        results.append(result)
+    
+    results.sort(key=lambda r: r["episode"])
+    return results
+
+
+def print_batch_summary(results, elapsed):
+    """Print a summary of a batch conversion.
+    
+    Args:
+        results: List of per-episode result dictionaries
+        elapsed: Wall-clock time of the whole batch in seconds
+    """
+    converted = [r for r in results if r["status"] == "converted"]
+    failed = [r for r in results if r["status"] == "failed"]
+    missing = [r for r in results if r["status"] == "missing"]
+    total_steps = sum(r["steps"] for r in converted)
+    
+    print(f"Converted {len(converted)}/{len(results)} episodes ({total_steps} steps) in {elapsed:.2f}s")
+    if converted:
+        durations = [r["duration"] for r in converted]
+        print(f"  Episode time: mean {sum(durations) / len(durations):.2f}s, max {max(durations):.2f}s")
+        if elapsed > 0:
+            print(f"  Throughput: {len(converted) / elapsed:.2f} episodes/s, {total_steps / elapsed:.1f} steps/s")
+    if missing:
+        print(f"  Missing episodes: {', '.join(str(r['episode']) for r in missing)}")
+    for r in failed:
+        print(f"  Failed episode {r['episode']}: {r['error']}")
+
+
+def batch_convert_episodes(dataset_name, start_episode, end_episode, output_dir="mcap_files", verbose=False, workers=1,
+                           schema_options=None, control_rate_hz=5, start_time=0.0, source_options=None, resume=False,
+                           profile=False, step_batch_size=32, pipeline=True,
+                           writer_options=None, manifest_name=MANIFEST_FILENAME, memory_limit=None, every_nth_step=1,
+                           episode_index=None):
     """Convert multiple episodes in batch mode.
     
+    With more than one worker the episode range is split into contiguous
+    shards that are converted in separate processes. The outcome of every
+    episode is recorded in a manifest in `output_dir`; when resuming,
+    episodes the manifest lists as converted (or missing from the dataset)
+    are skipped and only the rest are converted.
+    
+    With an episode index (see `open_x_embodiment.index`), the shards of
+    the workers are balanced by the size of their episodes instead of their
+    number, and episodes that a query of the index excluded, e.g. empty
+    ones, are skipped without being read.
+    
+    Nodes converting shards of a dataset each write their own manifest,
+    named by `manifest_name`, and merge them afterwards with
+    `open_x_embodiment.sharding.merge_manifests`.
+    
     Args:
         dataset_name: Name of the dataset
         start_episode: Starting episode number
         end_episode: Ending episode number (inclusive)
         output_dir: Directory to save MCAP files
+        verbose: Whether to print step information
+        workers: Number of worker processes
+        schema_options: Keyword arguments for the dataset schema
+        control_rate_hz: Control rate in Hz, used to timestamp steps
+        start_time: Log time of the first step of every episode in seconds since the Unix epoch
+        source_options: Keyword arguments for `load_builder`, e.g. the cache directory
+        resume: Skip episodes that a previous run already finished
+        profile: Profile every episode; merge the reports with `common.profiling.merge_reports`
+        step_batch_size: Number of steps handed to the schema at once
+        pipeline: Whether to read, process and write steps on separate threads
+        writer_options: Keyword arguments for `mcap_write_options`
+        manifest_name: Name of the manifest file in `output_dir`
+        memory_limit: Memory ceiling of the buffered steps and messages of every worker in bytes
+        every_nth_step: Convert only every nth step of each episode
+        episode_index: An `EpisodeIndex` of the dataset, None to balance shards by episode count
+        
+    Returns:
+        list: One result dictionary per episode converted in this run, ordered by episode number
+        
+    Raises:
+        UnknownDatasetError: If no schema is registered for the dataset, before any episode is read
     """
-    from open_x_embodiment.data_loader import load_dataset
+    schema_class_for_dataset(dataset_name)
     
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
     
-    # Load dataset builder once
-    b, _ = load_dataset(dataset_name, start_episode)
+    manifest = Manifest(output_dir, manifest_name)
+    episodes = set(range(start_episode, end_episode + 1))
+    if resume:
+        finished = episodes & manifest.finished_episodes(dataset_name)
+        if finished:
+            print(f"Skipping {len(finished)} episodes finished by a previous run")
+        episodes -= finished
+    sizes = None
+    if episode_index is not None:
+        excluded = episodes & episode_index.excluded
+        if excluded:
+            print(f"Skipping {len(excluded)} episodes excluded by the episode index")
+        episodes -= excluded
+        sizes = episode_index.sizes(sorted(episodes))
     
-    # Process each episode
-    for episode_num in range(start_episode, end_episode + 1):
-        print(f"Processing episode {episode_num}")
-        
-        # Load episode
-        ds = b.as_dataset(split=f"train[{episode_num}:{episode_num + 1}]")
+    batch_start = time.perf_counter()
+    results = []
+    
+    if workers <= 1:
+        for shard_start, shard_end in _shard_episodes(episodes, 1, sizes):
+            results.extend(_convert_episode_range(
+                dataset_name, shard_start, shard_end, output_dir, verbose, schema_options, control_rate_hz, start_time,
+                source_options, profile, step_batch_size, pipeline, writer_options, manifest_name,
+                memory_limit, every_nth_step
+            ))
+    else:
+        # Use more shards than workers so a slow shard doesn't leave the pool idle
+        shards = _shard_episodes(episodes, workers * 4, sizes)
         
-        try:
-            episode = next(iter(ds))
-            
-            # Create output filename
-            filename = os.path.join(output_dir, f"{dataset_name}_episode_{episode_num}.mcap")
-            
-            convert_episode(episode, filename, dataset_name=dataset_name, verbose=verbose)
-            
-        except StopIteration:
-            print(f"Episode {episode_num} not found in dataset.")
-            continue
-        except Exception as e:
-            print(f"Error processing episode {episode_num}: {e}")
-            continue
\ No newline at end of file
+        # TensorFlow is not fork-safe, so workers are started fresh
+        mp_context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+            futures = {
+                executor.submit(
+                    _convert_episode_range, dataset_name, shard_start, shard_end, output_dir, verbose, schema_options,
+                    control_rate_hz, start_time, source_options, profile, step_batch_size, pipeline,
+                    writer_options, manifest_name, memory_limit, every_nth_step
+                ): (shard_start, shard_end)
+                for shard_start, shard_end in shards
+            }
+            for future in as_completed(futures):
+                shard_start, shard_end = futures[future]
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    print(f"Error in worker for episodes {shard_start}-{shard_end}: {e}")
+                    for episode_num in range(shard_start, shard_end + 1):
+                        result = _new_episode_result(dataset_name, episode_num, output_dir)
+                        result["status"] = "failed"
+                        result["error"] = str(e)
+                        manifest.record(result)
+                        results.append(result)
+        results.sort(key=lambda r: r["episode"])
+    
+    print_batch_summary(results, time.perf_counter() - batch_start)
+    return results
@@ -14,34 +14,270 @@
 # limitations under the License.
 
 import tensorflow_datasets as tfds
+import tensorflow as tf
 import os
 
-def dataset2path(dataset_name):
-    """Convert dataset name to GCS path."""
+from open_x_embodiment.cache import DatasetCache
+
+def dataset2path(dataset_name, data_root=None):
+    """Convert dataset name to GCS path, or to a path under a local data root."""
     if dataset_name == "robo_net":
         version = "1.0.0"
     elif dataset_name == "language_table":
         version = "0.0.1"
     else:
         version = "0.1.0"
+    if data_root:
+        return os.path.join(data_root, dataset_name, version)
     return f"gs://gresearch/robotics/{dataset_name}/{version}"
 
-def load_dataset(dataset_name: str, episode_num: int) -> tuple:
+def load_builder(dataset_name: str, start_episode=None, end_episode=None, data_root=None, cache_dir=None,
+                 cache_size=None, offline=False):
+    """Load the dataset builder for a dataset.
+    
+    With a cache directory, the dataset's metadata and the shards holding
+    the episode range are mirrored to local disk on first access, and the
+    builder reads from that mirror.
+    
+    Args:
+        dataset_name: Name of the dataset
+        start_episode: First episode that will be read, None for all episodes
+        end_episode: Last episode that will be read (inclusive), None for all episodes
+        data_root: Local directory to read datasets from instead of GCS
+        cache_dir: Directory of the local dataset cache, None to disable caching
+        cache_size: Maximum size of the cache in bytes, None for no limit
+        offline: Never access the network, only read cached or local data
+        
+    Returns:
+        The dataset builder
+    """
+    builder_dir = dataset2path(dataset_name, data_root)
+    if cache_dir is None:
+        if offline and "://" in builder_dir:
+            raise ValueError("Offline mode needs a cache directory or a local data root")
+        return tfds.builder_from_directory(builder_dir=builder_dir)
+    
+    cache = DatasetCache(cache_dir, max_bytes=cache_size, offline=offline)
+    return cache.builder(builder_dir, start_episode, end_episode)
+
+def shard_file_sizes(dataset_name, filenames, data_root=None, cache_dir=None, cache_size=None, offline=False):
+    """Get the sizes of shard files of a dataset from the source `load_builder` reads.
+    
+    With a cache directory, sizes come from the cache, which only looks up
+    files it has not seen at the source.
+    
+    Args:
+        dataset_name: Name of the dataset
+        filenames: Names of the shard files, e.g. `split_info.filenames`
+        data_root: Local directory to read datasets from instead of GCS
+        cache_dir: Directory of the local dataset cache, None to disable caching
+        cache_size: Maximum size of the cache in bytes, None for no limit
+        offline: Never access the network, only read cached or local data
+        
+    Returns:
+        list: Size of each shard file in bytes
+    """
+    builder_dir = dataset2path(dataset_name, data_root)
+    if cache_dir is None:
+        if offline and "://" in builder_dir:
+            raise ValueError("Offline mode needs a cache directory or a local data root")
+        return [tf.io.gfile.stat(f"{builder_dir.rstrip('/')}/{filename}").length for filename in filenames]
+    
+    cache = DatasetCache(cache_dir, max_bytes=cache_size, offline=offline)
+    return cache.file_sizes(builder_dir, filenames)
+
+def image_skip_decoders(features):
+    """Build TFDS decoders that keep every image feature in its encoded form.
+    
+    Args:
+        features: Feature connector, e.g. `builder.info.features`
+        
+    Returns:
+        Nested decoders for `as_dataset`, or None if there are no image features
+    """
+    if isinstance(features, tfds.features.Image):
+        return tfds.decode.SkipDecoding()
+    if isinstance(features, tfds.features.Sequence):
+        # Also covers the nested `steps` dataset of RLDS episodes
+        return image_skip_decoders(features.feature)
+    if isinstance(features, tfds.features.FeaturesDict):
+        decoders = {}
+        for key, feature in features.items():
+            decoder = image_skip_decoders(feature)
+            if decoder is not None:
+                decoders[key] = decoder
+        return decoders or None
+    return None
+
+class _DroppedFeature(tfds.decode.Decoder):
+    """Decoder that discards a feature without decoding it"""
+    
+    def decode_example(self, serialized_example):
+        return tf.zeros((0,), tf.uint8)
+
+def _step_feature_paths(features, drop_features):
+    """Split feature paths such as "observation/image" and keep those the episodes' steps have"""
+    paths = []
+    for path in drop_features or ():
+        feature = features["steps"].feature
+        parts = path.split("/")
+        for part in parts:
+            feature = feature[part] if isinstance(feature, tfds.features.FeaturesDict) and part in feature else None
+            if feature is None:
+                break
+        if feature is not None:
+            paths.append(parts)
+    return paths
+
+def episode_decoders(features, skip_image_decoding=False, drop_features=None):
+    """Build TFDS decoders for reading the episodes of a dataset.
+    
+    Images can be kept encoded, and step features that are not needed are
+    discarded before they are decoded, e.g. the images of topics that are
+    not converted. Use `drop_step_features` to remove their placeholders.
+    
+    Args:
+        features: Feature connector, e.g. `builder.info.features`
+        skip_image_decoding: Keep image features as encoded (e.g. JPEG) bytes
+        drop_features: Paths of step features to discard, such as "observation/hand_image"
+        
+    Returns:
+        Nested decoders for `as_dataset`, or None to decode every feature
+    """
+    decoders = (image_skip_decoders(features) if skip_image_decoding else None) or {}
+    for parts in _step_feature_paths(features, drop_features):
+        node = decoders.setdefault("steps", {})
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = _DroppedFeature()
+    return decoders or None
+
+def drop_step_features(episode, features, drop_features):
+    """Remove the placeholders of step features discarded by `episode_decoders` from an episode
+    
+    Args:
+        episode: Episode read with the decoders of `episode_decoders`
+        features: Feature connector, e.g. `builder.info.features`
+        drop_features: The paths passed to `episode_decoders`
+        
+    Returns:
+        The episode, whose steps no longer have the discarded features
+    """
+    paths = _step_feature_paths(features, drop_features)
+    if not paths:
+        return episode
+    
+    def prune(step):
+        step = dict(step)
+        for parts in paths:
+            node = step
+            for part in parts[:-1]:
+                node[part] = dict(node[part])
+                node = node[part]
+            node.pop(parts[-1], None)
+        return step
+    
+    episode = dict(episode)
+    episode["steps"] = episode["steps"].map(prune)
+    return episode
+
+def iter_episodes(builder, start_episode: int, end_episode: int, interleave_cycle_length: int = 4,
+                  skip_image_decoding: bool = False, prefetch=None, drop_features=None):
+    """Stream a range of episodes in a single pass over the dataset.
+    
+    The split `train[start_episode:end_episode + 1]` is opened once and read
+    with interleaved shard reads and prefetching, so the cost of a range grows
+    with its size rather than with its offset. Since interleaving does not
+    preserve the episode order, every episode is yielded with its index in the
+    split, recovered from its TFDS id.
+    
+    Args:
+        builder: The dataset builder
+        start_episode: Starting episode number
+        end_episode: Ending episode number (inclusive), clamped to the split size
+        interleave_cycle_length: Number of shard files read concurrently
+        skip_image_decoding: Keep image features as encoded (e.g. JPEG) bytes
+        prefetch: Number of episodes read ahead, None to let tf.data tune it
+        drop_features: Paths of step features not to decode, such as "observation/hand_image"
+        
+    Yields:
+        tuple: (episode_index, episode)
+    """
+    split_info = builder.info.splits["train"]
+    end_episode = min(end_episode, split_info.num_examples - 1)
+    if end_episode < start_episode:
+        return
+    
+    # Global index of the first example of each shard file
+    shard_offsets = {}
+    offset = 0
+    for filename, shard_length in zip(split_info.filenames, split_info.shard_lengths):
+        shard_offsets[filename] = offset
+        offset += shard_length
+    
+    read_config = tfds.ReadConfig(
+        add_tfds_id=True,
+        interleave_cycle_length=interleave_cycle_length,
+        num_parallel_calls_for_interleave_files=tf.data.AUTOTUNE,
+    )
+    ds = builder.as_dataset(
+        split=f"train[{start_episode}:{end_episode + 1}]",
+        read_config=read_config,
+        decoders=episode_decoders(builder.info.features, skip_image_decoding, drop_features),
+    )
+    if prefetch is None:
+        ds = ds.prefetch(tf.data.AUTOTUNE)
+    elif prefetch > 0:
+        ds = ds.prefetch(prefetch)
+    
+    for episode in ds:
+        # TFDS ids look like "<shard filename>__<index within the shard>"
+        filename, local_index = episode.pop("tfds_id").numpy().decode("utf-8").rsplit("__", 1)
+        yield shard_offsets[filename] + int(local_index), drop_step_features(episode, builder.info.features, drop_features)
+
+def episode_source(builder, episode_index: int, split: str = "train") -> tuple:
+    """Locate an episode in the shard files of a split.
+    
+    Args:
+        builder: The dataset builder
+        episode_index: Index of the episode in the split
+        split: Name of the split
+        
+    Returns:
+        tuple: (shard filename, index of the episode within the shard)
+    """
+    split_info = builder.info.splits[split]
+    offset = 0
+    for filename, shard_length in zip(split_info.filenames, split_info.shard_lengths):
+        if episode_index < offset + shard_length:
+            return filename, episode_index - offset
+        offset += shard_length
+    raise IndexError(f"Episode {episode_index} is out of range for split '{split}'")
+
+def load_dataset(dataset_name: str, episode_num: int, skip_image_decoding: bool = False, source_options=None,
+                 drop_features=None) -> tuple:
     """Load a specific episode from a dataset.
     
     Args:
         dataset_name: Name of the dataset
         episode_num: Episode number to load
+        skip_image_decoding: Keep image features as encoded (e.g. JPEG) bytes
+        source_options: Keyword arguments for `load_builder`, e.g. the cache directory
+        drop_features: Paths of step features not to decode, such as "observation/hand_image"
         
     Returns:
         tuple: (dataset_builder, episode)
     """
-    # Load the dataset
-    b = tfds.builder_from_directory(builder_dir=dataset2path(dataset_name))
-    ds = b.as_dataset(split=f"train[{episode_num}:{episode_num + 1}]")
-    
+    b = None
     try:
-        episode = next(iter(ds))
+        # Load the dataset
+        b = load_builder(dataset_name, episode_num, episode_num, **(source_options or {}))
+        ds = b.as_dataset(
+            split=f"train[{episode_num}:{episode_num + 1}]",
+            decoders=episode_decoders(b.info.features, skip_image_decoding, drop_features),
+        )
+        
+        episode = drop_step_features(next(iter(ds)), b.info.features, drop_features)
         print(f"Successfully loaded dataset: {dataset_name}, episode: {episode_num}")
         
         assert "steps" in episode, "The dataset does not contain 'steps' key."
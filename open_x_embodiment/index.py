@@ -0,0 +1,349 @@
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+
+import numpy as np
+
+# Version of the columns written by `EpisodeIndex.save`
+INDEX_FORMAT_VERSION = 1
+
+# Columns every index has; the others are named after the features they describe
+BASE_COLUMNS = ("episode", "steps", "num_bytes", "source_shard", "source_offset")
+
+# Prefixes of the feature columns
+TEXT_PREFIX = "text/"
+STATS_PREFIX = "stats/"
+METADATA_PREFIX = "metadata/"
+
+# Statistics of every numeric step feature
+STATISTICS = ("min", "max", "mean")
+
+# Number of steps converted to NumPy at once
+_STEP_BATCH_SIZE = 4096
+
+
+def index_filename(dataset_name):
+    """Get the default file name of the index of a dataset"""
+    return f"{dataset_name}.index.npz"
+
+
+class EpisodeIndex:
+    """Per-episode metadata of a dataset, stored as columns.
+
+    Every column holds one value (or one vector) per indexed episode:
+
+    - `episode`, `steps`, `num_bytes`: episode number, step count and size
+      of its serialized record in the dataset
+    - `source_shard`, `source_offset`: shard file holding the episode and
+      its index within that file
+    - `text/<feature>`: first value of every text step feature, such as
+      the language instruction
+    - `stats/<feature>/min|max|mean`: per-dimension statistics of every
+      numeric step feature, such as the robot state, NaN for empty episodes
+    - `metadata/<feature>`: scalar episode metadata, such as the file path
+
+    Indexes are saved as uncompressed NumPy `.npz` files, so loading one
+    needs nothing but NumPy and a single column can be read on its own.
+    """
+
+    def __init__(self, dataset_name, columns, excluded=()):
+        """Initialize the index
+
+        Args:
+            dataset_name: Name of the dataset
+            columns: Dictionary mapping column names to arrays with one row per episode
+            excluded: Episode numbers that a query filtered out of the index
+        """
+        self.dataset_name = dataset_name
+        self.columns = columns
+        self.excluded = frozenset(int(episode) for episode in excluded)
+
+    def __len__(self):
+        return len(self.columns["episode"])
+
+    @property
+    def episodes(self):
+        """Episode numbers of the indexed episodes"""
+        return self.columns["episode"]
+
+    def column(self, name):
+        """Get a column by its name, e.g. "steps" or "stats/observation/state/mean" """
+        if name not in self.columns:
+            raise KeyError(f"Index of {self.dataset_name} has no column '{name}'. "
+                           f"Columns: {', '.join(sorted(self.columns))}")
+        return self.columns[name]
+
+    def rows(self, mask):
+        """Get an index of the episodes selected by a boolean mask, excluding the others"""
+        excluded = self.excluded | set(self.episodes[~mask].tolist())
+        return EpisodeIndex(self.dataset_name, {name: values[mask] for name, values in self.columns.items()},
+                            excluded)
+
+    def query(self, start=None, end=None, min_steps=None, max_steps=None):
+        """Select the episodes of a range and of a number of steps
+
+        Episodes the query filters out are listed in `excluded` of the
+        result, so conversions can skip them without reading them.
+
+        Args:
+            start: First episode number, None for the first indexed episode
+            end: Last episode number (inclusive), None for the last indexed episode
+            min_steps: Minimum number of steps, e.g. 1 to skip empty episodes
+            max_steps: Maximum number of steps
+
+        Returns:
+            EpisodeIndex: Index of the selected episodes
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.episodes >= start
+        if end is not None:
+            mask &= self.episodes <= end
+        if min_steps is not None:
+            mask &= self.columns["steps"] >= min_steps
+        if max_steps is not None:
+            mask &= self.columns["steps"] <= max_steps
+        return self.rows(mask)
+
+    def sizes(self, episodes, default=None):
+        """Get the serialized size of episodes in bytes
+
+        Args:
+            episodes: Episode numbers
+            default: Size of episodes that are not indexed, by default the mean indexed size
+
+        Returns:
+            np.ndarray: Size of each episode
+        """
+        sizes = dict(zip(self.episodes.tolist(), self.columns["num_bytes"].tolist()))
+        if default is None:
+            default = float(np.mean(self.columns["num_bytes"])) if len(self) else 1.0
+        return np.array([sizes.get(episode, default) for episode in episodes], dtype=np.float64)
+
+    def summary(self):
+        """Summarize the indexed episodes
+
+        Returns:
+            dict: Number of episodes and of empty episodes, and the total, minimum and maximum steps and bytes
+        """
+        steps, num_bytes = self.columns["steps"], self.columns["num_bytes"]
+        return {
+            "episodes": len(self),
+            "empty_episodes": int(np.count_nonzero(steps == 0)),
+            "steps": int(steps.sum()),
+            "min_steps": int(steps.min()) if len(self) else 0,
+            "max_steps": int(steps.max()) if len(self) else 0,
+            "num_bytes": int(num_bytes.sum()),
+            "max_bytes": int(num_bytes.max()) if len(self) else 0,
+        }
+
+    def save(self, path):
+        """Write the index to an `.npz` file, replacing any previous one atomically
+
+        Args:
+            path: Path of the index file
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        partial_path = path + ".partial"
+        with open(partial_path, "wb") as f:
+            np.savez(f, format_version=np.int64(INDEX_FORMAT_VERSION), dataset_name=np.str_(self.dataset_name),
+                     **self.columns)
+        os.replace(partial_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by `save`
+
+        Args:
+            path: Path of the index file
+
+        Returns:
+            EpisodeIndex: The index
+
+        Raises:
+            ValueError: If the file was written by an incompatible version
+        """
+        with np.load(path, allow_pickle=False) as data:
+            columns = {name: data[name] for name in data.files}
+        version = int(columns.pop("format_version", -1))
+        if version != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Index {path} has format version {version}, expected {INDEX_FORMAT_VERSION}")
+        return cls(str(columns.pop("dataset_name")), columns)
+
+
+def _leaf_features(features, prefix=""):
+    """List the (path, feature) pairs of the leaves of a features dictionary"""
+    import tensorflow_datasets as tfds
+
+    leaves = []
+    for key, feature in features.items():
+        path = f"{prefix}{key}"
+        if isinstance(feature, tfds.features.FeaturesDict):
+            leaves.extend(_leaf_features(feature, path + "/"))
+        else:
+            leaves.append((path, feature))
+    return leaves
+
+
+def _feature_kind(feature):
+    """Classify a leaf step feature as "text", "numeric" (scalar or vector), "heavy" (images and other arrays)
+    or "other", e.g. flags"""
+    import tensorflow_datasets as tfds
+
+    if isinstance(feature, (tfds.features.Image, tfds.features.Sequence, tfds.features.Dataset)) \
+            or len(feature.shape) > 1:
+        return "heavy"
+    dtype = np.dtype(feature.np_dtype)
+    if dtype.kind in "OSU":
+        return "text" if not feature.shape else "heavy"
+    if dtype.kind == "b":
+        return "other"
+    return "numeric" if dtype.kind in "iuf" else "heavy"
+
+
+def _stack_steps(steps, paths):
+    """Read features of all steps of an episode as NumPy arrays
+
+    Returns:
+        dict: Stacked values of each feature path, None for an episode without steps
+    """
+    parts = {path: [] for path in paths}
+    for batch in steps.batch(_STEP_BATCH_SIZE):
+        for path in paths:
+            parts[path].append(_nested_get(batch, path).numpy())
+    if not any(parts.values()):
+        return None
+    return {path: np.concatenate(values) for path, values in parts.items()}
+
+
+def _nested_get(data, path):
+    """Get a value of a nested dictionary by its path"""
+    for part in path.split("/"):
+        data = data[part]
+    return data
+
+
+def build_index(dataset_name, start_episode=0, end_episode=None, source_options=None, split="train"):
+    """Scan the episodes of a dataset once and collect their metadata
+
+    The shard files are read as raw records, so every episode's serialized
+    size is exact, and parsed without images and other multi-dimensional
+    step features, which are never decoded. Per-dimension statistics are
+    computed with NumPy over all steps of an episode at once.
+
+    Args:
+        dataset_name: Name of the dataset
+        start_episode: First episode to index
+        end_episode: Last episode to index (inclusive), None for the last episode of the split
+        source_options: Keyword arguments for `load_builder`, e.g. the cache directory
+        split: Name of the split
+
+    Returns:
+        EpisodeIndex: The index of the episodes
+    """
+    import tensorflow as tf
+    from open_x_embodiment.data_loader import drop_step_features, episode_decoders, load_builder
+
+    builder = load_builder(dataset_name, start_episode, end_episode, **(source_options or {}))
+    split_info = builder.info.splits[split]
+    if end_episode is None or end_episode >= split_info.num_examples:
+        end_episode = split_info.num_examples - 1
+
+    features = builder.info.features
+    step_leaves = _leaf_features(features["steps"].feature)
+    episode_leaves = [(path, feature) for path, feature in _leaf_features(features)
+                      if not path.startswith("steps") and _feature_kind(feature) != "heavy" and not feature.shape]
+    heavy = [path for path, feature in step_leaves if _feature_kind(feature) == "heavy"]
+    text = [path for path, feature in step_leaves if _feature_kind(feature) == "text"]
+    numeric = [path for path, feature in step_leaves if _feature_kind(feature) == "numeric"]
+    # Every light feature is read, so that steps are counted even without text or numeric features
+    light = [path for path, _ in step_leaves if path not in heavy]
+    decoders = episode_decoders(features, drop_features=heavy)
+
+    # Read only the shard files holding the range, in order, so episodes come in their split order
+    files, first_episode, offset = [], None, 0
+    for filename, shard_length in zip(split_info.filenames, split_info.shard_lengths):
+        if offset + shard_length > start_episode and offset <= end_episode:
+            files.append((filename, offset, shard_length))
+            first_episode = offset if first_episode is None else first_episode
+        offset += shard_length
+    if not files or end_episode < start_episode:
+        print(f"No episodes of {dataset_name} in the range {start_episode}-{end_episode}")
+        return EpisodeIndex(dataset_name, _empty_columns(text, numeric, episode_leaves))
+
+    @tf.autograph.experimental.do_not_convert
+    def parse(record):
+        return tf.strings.length(record), features.deserialize_example(record, decoders=decoders)
+
+    records = tf.data.TFRecordDataset([os.path.join(builder.data_dir, filename) for filename, _, _ in files])
+    records = records.skip(start_episode - first_episode).take(end_episode - start_episode + 1)
+    records = records.map(parse, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+    sources = [(filename, local_index) for filename, _, shard_length in files for local_index in range(shard_length)]
+    rows = []
+    start = time.perf_counter()
+    for episode_num, (num_bytes, episode) in enumerate(records, start_episode):
+        episode = drop_step_features(episode, features, heavy)
+        steps = _stack_steps(episode["steps"], light)
+        row = {
+            "episode": episode_num,
+            "steps": 0 if steps is None else len(steps[light[0]]),
+            "num_bytes": int(num_bytes),
+            "source_shard": sources[episode_num - first_episode][0],
+            "source_offset": sources[episode_num - first_episode][1],
+        }
+        for path in text:
+            row[TEXT_PREFIX + path] = "" if steps is None else steps[path][0].decode("utf-8")
+        for path in numeric:
+            values = None if steps is None else steps[path].astype(np.float64).reshape(row["steps"], -1)
+            for statistic in STATISTICS:
+                row[f"{STATS_PREFIX}{path}/{statistic}"] = None if values is None else \
+                    getattr(np, statistic)(values, axis=0)
+        for path, _ in episode_leaves:
+            value = _nested_get(episode, path).numpy()
+            row[METADATA_PREFIX + path] = value.decode("utf-8") if isinstance(value, bytes) else value
+        rows.append(row)
+    print(f"Indexed {len(rows)} episodes of {dataset_name} in {time.perf_counter() - start:.1f}s")
+
+    columns = _empty_columns(text, numeric, episode_leaves)
+    if not rows:
+        return EpisodeIndex(dataset_name, columns)
+    for name, empty in columns.items():
+        values = [row[name] for row in rows]
+        if name.startswith(STATS_PREFIX):
+            # Empty episodes have no statistics
+            width = max((len(value) for value in values if value is not None), default=0)
+            values = [np.full(width, np.nan) if value is None else value for value in values]
+            columns[name] = np.array(values, dtype=np.float64).reshape(len(rows), width)
+        else:
+            # Text and metadata columns take the type of their values
+            columns[name] = np.array(values, dtype=None if empty.dtype.kind == "U" else empty.dtype)
+    return EpisodeIndex(dataset_name, columns)
+
+
+def _empty_columns(text, numeric, episode_leaves):
+    """Create the empty columns of an index with the given text, numeric and metadata features"""
+    columns = {
+        "episode": np.zeros(0, dtype=np.int64),
+        "steps": np.zeros(0, dtype=np.int64),
+        "num_bytes": np.zeros(0, dtype=np.int64),
+        "source_shard": np.zeros(0, dtype=np.str_),
+        "source_offset": np.zeros(0, dtype=np.int64),
+    }
+    columns.update({TEXT_PREFIX + path: np.zeros(0, dtype=np.str_) for path in text})
+    columns.update({f"{STATS_PREFIX}{path}/{statistic}": np.zeros((0, 0)) for path in numeric for statistic in STATISTICS})
+    columns.update({METADATA_PREFIX + path: np.zeros(0, dtype=np.str_) for path, _ in episode_leaves})
+    return columns
@@ -0,0 +1,152 @@
+"""Live preview of converted episodes over a Foxglove WebSocket server."""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+import time
+
+import foxglove
+from foxglove import Channel
+
+
+class _TeeChannel:
+    """Channel wrapper that also hands every logged message to a live preview."""
+
+    def __init__(self, channel, mirror, preview):
+        self._channel = channel
+        self._mirror = mirror
+        self._preview = preview
+
+    @property
+    def inner(self):
+        """Channel this wrapper logs to"""
+        return self._channel
+
+    def log(self, msg, *, log_time=None, **kwargs):
+        self._channel.log(msg, log_time=log_time, **kwargs)
+        self._preview.push(self._mirror, msg, log_time)
+
+    def __getattr__(self, name):
+        return getattr(self._channel, name)
+
+
+class LivePreview:
+    """Replays converted messages to a WebSocket server at their recorded pace.
+
+    Conversion logs to its MCAP writer at full speed, while every message is
+    also put into a bounded ring buffer. A scheduler thread takes messages
+    from the buffer and logs them to a server on a separate foxglove
+    context, sleeping so that they are spaced by their log times. When the
+    viewer falls behind, the oldest buffered messages are dropped instead of
+    stalling conversion, and playback resumes from the oldest one left.
+    """
+
+    def __init__(self, buffer_size=1024, port=8765):
+        """Initialize the preview
+
+        Args:
+            buffer_size: Maximum number of messages waiting to be replayed
+            port: Port of the WebSocket server
+        """
+        self.port = port
+        self.context = foxglove.Context()
+        self.dropped = 0
+        self._buffer = collections.deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._closed = False
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Start the WebSocket server and the replay thread"""
+        self._server = foxglove.start_server(context=self.context, port=self.port)
+        self._thread = threading.Thread(target=self._replay, name="live-preview", daemon=True)
+        self._thread.start()
+
+    def tap(self, channels):
+        """Wrap channels so that their messages are also replayed live
+
+        Args:
+            channels: Dictionary of channels returned by `setup_channels()`
+
+        Returns:
+            Dictionary of wrapped channels with the same keys
+        """
+        return {key: _TeeChannel(channel, self._mirror(channel), self) for key, channel in channels.items()}
+
+    def push(self, mirror, msg, log_time):
+        """Buffer a message for replay, dropping the oldest one if the buffer is full"""
+        with self._condition:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append((mirror, msg, log_time))
+            self._condition.notify()
+
+    def stop(self, drain=True):
+        """Stop the preview
+
+        Args:
+            drain: Whether to replay the remaining buffered messages first
+        """
+        with self._condition:
+            if not drain:
+                self._buffer.clear()
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self._server is not None:
+            self._server.stop()
+        if self.dropped:
+            print(f"Live preview dropped {self.dropped} messages that the viewer could not keep up with")
+
+    def _mirror(self, channel):
+        """Create a channel on the preview context matching `channel`"""
+        # Mirror the foxglove channel under profiling or pipeline wrappers
+        while hasattr(channel, "inner"):
+            channel = channel.inner
+        if isinstance(channel, Channel):
+            return Channel(
+                channel.topic(),
+                schema=channel.schema(),
+                message_encoding=channel.message_encoding,
+                context=self.context,
+            )
+        # Typed channels, e.g. RawImageChannel, only need a topic
+        return type(channel)(topic=channel.topic(), context=self.context)
+
+    def _replay(self):
+        """Log buffered messages to the server, paced by their log times"""
+        anchor = None
+        dropped = 0
+        while True:
+            with self._condition:
+                while not self._buffer and not self._closed:
+                    self._condition.wait()
+                if not self._buffer:
+                    return
+                mirror, msg, log_time = self._buffer.popleft()
+                # Restart the clock after a gap in the stream
+                if dropped != self.dropped:
+                    dropped = self.dropped
+                    anchor = None
+
+            if log_time is not None:
+                if anchor is None:
+                    anchor = (time.monotonic(), log_time)
+                delay = anchor[0] + (log_time - anchor[1]) / 1e9 - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            mirror.log(msg, log_time=log_time)
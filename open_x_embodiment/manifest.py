@@ -0,0 +1,125 @@
+"""Conversion manifest recording the outcome of every episode of a batch."""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+MANIFEST_FILENAME = "manifest.jsonl"
+
+# Statuses that are not retried when resuming
+FINAL_STATUSES = ("converted", "missing")
+
+
+def file_sha256(path):
+    """Compute the SHA-256 checksum of a file"""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class Manifest:
+    """Append-only JSONL log of per-episode conversion results.
+
+    Every finished episode appends one line holding its status, source
+    shard and offset, output size, step count, checksum, duration and error.
+    Lines are written under a file lock by whichever process converted the
+    episode, so the manifest stays valid if a batch dies half way. When an
+    episode appears more than once, its latest record wins. Records are
+    kept apart by dataset, so datasets converted into the same output
+    directory can share a manifest.
+    """
+
+    def __init__(self, output_dir, filename=MANIFEST_FILENAME):
+        """Initialize the manifest
+
+        Args:
+            output_dir: Directory holding the MCAP files and the manifest
+            filename: Name of the manifest file
+        """
+        self.path = os.path.join(output_dir, filename)
+
+    def record(self, result):
+        """Append the result of one episode
+
+        Args:
+            result: Result dictionary of the episode; its profiling report is left out
+        """
+        record = {key: value for key, value in result.items() if key != "profile"}
+        line = json.dumps(dict(record, recorded_at=time.time()), sort_keys=True) + "\n"
+        with open(self.path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(line)
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load(self):
+        """Load the latest record of every episode
+
+        Returns:
+            dict: (dataset name, episode number) to the latest result dictionary of the episode
+        """
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by a crash
+                    continue
+                records[(record.get("dataset", ""), record["episode"])] = record
+        return records
+
+    def finished_episodes(self, dataset_name):
+        """Get the episodes of a dataset that do not need to be converted again
+
+        An episode is finished if it was converted and its output file still
+        exists with the recorded size, or if it is missing from the dataset.
+
+        Args:
+            dataset_name: Name of the dataset
+
+        Returns:
+            set: Episode numbers
+        """
+        finished = set()
+        for (dataset, episode_num), record in self.load().items():
+            if dataset != dataset_name or record["status"] not in FINAL_STATUSES:
+                continue
+            if record["status"] == "converted":
+                output_file = record.get("output_file")
+                if not output_file or not os.path.exists(output_file):
+                    continue
+                if os.path.getsize(output_file) != record.get("output_size"):
+                    continue
+            finished.add(episode_num)
+        return finished
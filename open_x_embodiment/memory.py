@@ -0,0 +1,98 @@
+"""Sizing of the step buffers of a conversion to stay below a memory ceiling."""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+
+import numpy as np
+
+
+def _feature_nbytes(value):
+    """Get the size of a decoded feature in bytes"""
+    array = np.asarray(value)
+    if array.dtype == object:
+        # Strings, e.g. instructions or images kept encoded
+        return sum(len(item) for item in array.reshape(-1))
+    return array.nbytes
+
+
+def estimate_step_bytes(steps):
+    """Measure the decoded size of the first step of an episode.
+
+    Steps of RLDS episodes have the same features and, except for encoded
+    images, the same shapes, so the first step stands for all of them.
+    Only that step is decoded; the episode is not read further.
+
+    Taking the first step of an iterator consumes it, so the steps are
+    returned as well: iterate them instead of `steps`, which may have lost
+    their first step.
+
+    Args:
+        steps: The `steps` dataset of an episode, or any iterable of steps
+
+    Returns:
+        tuple: (size of the step in bytes, size of its largest feature in bytes, steps to iterate), with sizes
+            of 0 for an empty episode
+    """
+    import tensorflow as tf
+
+    if hasattr(steps, "take"):
+        first = next(iter(steps.take(1)), None)
+    elif iter(steps) is steps:
+        first = next(steps, None)
+        if first is not None:
+            steps = itertools.chain([first], steps)
+    else:
+        # Lists and other iterables start over when iterated again
+        first = next(iter(steps), None)
+    if first is None:
+        return 0, 0, steps
+    sizes = [_feature_nbytes(value) for value in tf.nest.flatten(first)]
+    return sum(sizes), max(sizes, default=0), steps
+
+
+def plan_memory(memory_limit, step_bytes, largest_feature_bytes, step_batch_size=32, max_pending_images=64):
+    """Size the buffers of a conversion to fit a memory ceiling.
+
+    Half of the ceiling goes to steps being read and processed: with the
+    pipeline, one batch is queued, one is being read and one is being
+    processed, so batches are a sixth of the ceiling. A quarter goes to
+    messages waiting for the writer and a quarter to images waiting for
+    their encoder. TensorFlow's own memory, the MCAP writer's open chunk
+    and the serialized episode record are not part of the ceiling.
+
+    Args:
+        memory_limit: Memory ceiling of the step buffers in bytes
+        step_bytes: Decoded size of a step in bytes
+        largest_feature_bytes: Decoded size of the largest feature of a step, e.g. an image, in bytes
+        step_batch_size: Number of steps per batch without a ceiling
+        max_pending_images: Number of images being encoded at once without a ceiling
+
+    Returns:
+        dict: "step_batch_size", "read_queue_size", "write_queue_bytes" and "max_pending_images"
+    """
+    if memory_limit <= 0:
+        raise ValueError(f"Invalid memory limit: {memory_limit}")
+    step_bytes = max(1, step_bytes)
+    batch_size = int(min(step_batch_size, memory_limit // 6 // step_bytes))
+    if batch_size < 1:
+        print(f"Memory limit of {memory_limit / 1e6:.0f} MB is below what three steps of "
+              f"{step_bytes / 1e6:.1f} MB need; processing steps one by one")
+        batch_size = 1
+    return {
+        "step_batch_size": batch_size,
+        "read_queue_size": 1,
+        "write_queue_bytes": memory_limit // 4,
+        "max_pending_images": int(max(1, min(max_pending_images, memory_limit // 4 // max(1, largest_feature_bytes)))),
+    }
@@ -0,0 +1,217 @@
+"""Reader and writer threads that overlap reading, processing and writing an episode."""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import queue
+import threading
+import time
+
+from common.profiling import NULL_PROFILER, message_size
+
+# Marks the end of a queue
+_DONE = object()
+
+# Seconds between checks whether the other side of a queue stopped
+_POLL_INTERVAL = 0.1
+
+
+class _Failure:
+    """Exception raised on a pipeline thread, handed to the converting thread."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class _QueuedChannel:
+    """Channel wrapper that hands messages to the writer thread instead of logging them."""
+
+    def __init__(self, channel, pipeline):
+        self._channel = channel
+        self._pipeline = pipeline
+        self._message_size = None
+
+    @property
+    def inner(self):
+        """Channel the writer thread logs to"""
+        return self._channel
+
+    def log(self, msg, *, log_time=None, **kwargs):
+        size = self._size(msg) if self._pipeline.write_queue_bytes else 0
+        self._pipeline._put_message((self._channel, msg, log_time, kwargs, size), size)
+
+    def _size(self, msg):
+        """Estimate the size of a message without serializing every one"""
+        if isinstance(msg, (bytes, bytearray, dict)):
+            return message_size(msg)
+        # Messages of a channel, e.g. images, have about the same size
+        if self._message_size is None:
+            self._message_size = message_size(msg)
+        return self._message_size
+
+    def __getattr__(self, name):
+        return getattr(self._channel, name)
+
+
+class ConversionPipeline:
+    """Three-stage pipeline of reader thread, schema and writer thread.
+
+    The reader thread pulls steps (or batches of steps) from the dataset
+    iterator, which decodes them, while the converting thread runs the
+    schema on the previous ones. Messages the schema logs are queued for a
+    single writer thread that logs them to the MCAP writer, which serializes,
+    compresses and writes them to disk. Both queues are bounded, so a slow
+    stage blocks the stages feeding it instead of buffering without limit.
+    The write queue can also be bounded by the size of its messages.
+
+    The schema stays on the converting thread because schemas keep state
+    across steps, e.g. latched values and pending image encodings; image
+    encoding is parallelized separately by the schema's `ImagePublisher`.
+    Messages reach the writer in the order they were logged, which keeps
+    the order of every channel. An exception on the reader or writer thread
+    is raised again on the converting thread.
+    """
+
+    def __init__(self, read_queue_size=4, write_queue_size=1024, write_queue_bytes=None, profiler=None):
+        """Initialize the pipeline
+
+        Args:
+            read_queue_size: Maximum number of steps or batches read ahead
+            write_queue_size: Maximum number of messages waiting to be written
+            write_queue_bytes: Maximum estimated size of the messages waiting to be written, None for no limit
+            profiler: A `common.profiling.Profiler` to report the writer thread's time to
+        """
+        self.profiler = profiler or NULL_PROFILER
+        self.write_queue_bytes = write_queue_bytes
+        self._queued_bytes = 0
+        self._bytes_written = threading.Condition()
+        self._read_queue = queue.Queue(maxsize=read_queue_size)
+        self._write_queue = queue.Queue(maxsize=write_queue_size)
+        self._stopped = threading.Event()
+        self._reader = None
+        self._writer = None
+        self._write_error = None
+
+    def wrap(self, channels):
+        """Wrap channels so that their messages are written on the writer thread
+
+        Args:
+            channels: Dictionary of channels returned by `setup_channels()`
+
+        Returns:
+            Dictionary of wrapped channels with the same keys
+        """
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write, name="mcap-writer", daemon=True)
+            self._writer.start()
+        return {key: _QueuedChannel(channel, self) for key, channel in channels.items()}
+
+    def read(self, items):
+        """Iterate over items that a reader thread pulls ahead of time
+
+        Args:
+            items: Iterable of steps or batches of steps
+
+        Yields:
+            The items in their original order
+        """
+        self._reader = threading.Thread(target=self._read, args=(iter(items),), name="step-reader", daemon=True)
+        self._reader.start()
+        while True:
+            item = self._read_queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+
+    def flush(self):
+        """Wait until all queued messages are written, raising any error of the writer thread"""
+        if self._writer is not None:
+            self._put_message(_DONE)
+            self._writer.join()
+            self._writer = None
+        self._raise_write_error()
+
+    def close(self):
+        """Stop the pipeline threads, discarding messages that were not flushed"""
+        self._stopped.set()
+        for thread in (self._reader, self._writer):
+            if thread is not None:
+                thread.join()
+        self._reader = None
+        self._writer = None
+
+    def _put(self, q, item):
+        """Put an item into a queue, giving up once the pipeline is stopped"""
+        while not self._stopped.is_set():
+            try:
+                q.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _put_message(self, message, size=0):
+        self._raise_write_error()
+        if size:
+            with self._bytes_written:
+                # A single message larger than the limit is still let through
+                while self._queued_bytes and self._queued_bytes + size > self.write_queue_bytes \
+                        and not self._stopped.is_set():
+                    self._bytes_written.wait(_POLL_INTERVAL)
+                self._queued_bytes += size
+        self._put(self._write_queue, message)
+
+    def _raise_write_error(self):
+        if self._write_error is not None:
+            error, self._write_error = self._write_error, None
+            raise error
+
+    def _read(self, items):
+        """Reader thread: pull items into the read queue"""
+        try:
+            for item in items:
+                if not self._put(self._read_queue, item):
+                    return
+            self._put(self._read_queue, _DONE)
+        except Exception as e:
+            self._put(self._read_queue, _Failure(e))
+
+    def _write(self):
+        """Writer thread: log queued messages to their channels"""
+        while True:
+            try:
+                message = self._write_queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if self._stopped.is_set():
+                    return
+                continue
+            if message is _DONE:
+                return
+            channel, msg, log_time, kwargs, size = message
+            del message
+            # After an error, keep draining so the converting thread does not block
+            if self._write_error is None:
+                start = time.perf_counter()
+                try:
+                    channel.log(msg, log_time=log_time, **kwargs)
+                except Exception as e:
+                    self._write_error = e
+                self.profiler.add_time("write (writer thread)", time.perf_counter() - start)
+            # Release the message before making room for the next ones
+            del msg
+            if size:
+                with self._bytes_written:
+                    self._queued_bytes -= size
+                    self._bytes_written.notify()
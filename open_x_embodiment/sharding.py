@@ -0,0 +1,210 @@
+"""Deterministic assignment of a dataset's episodes to the nodes of a cluster."""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import json
+import os
+import re
+
+import numpy as np
+
+from open_x_embodiment.manifest import MANIFEST_FILENAME, Manifest
+
+# Name of the manifest fragment written by one shard
+SHARD_MANIFEST_FORMAT = "manifest.shard-{shard_index:05d}-of-{num_shards:05d}.jsonl"
+_SHARD_MANIFEST_RE = re.compile(r"manifest\.shard-(\d+)-of-(\d+)\.jsonl$")
+
+
+def shard_manifest_filename(shard_index, num_shards):
+    """Get the name of the manifest fragment of a shard"""
+    return SHARD_MANIFEST_FORMAT.format(shard_index=shard_index, num_shards=num_shards)
+
+
+def estimate_episode_sizes(split_info, file_sizes):
+    """Estimate the size of every episode of a split in bytes.
+
+    Every episode of a shard file is estimated at the file's size divided
+    by its number of episodes.
+
+    Args:
+        split_info: TFDS split info, e.g. `builder.info.splits["train"]`
+        file_sizes: Size of each shard file of the split in bytes
+
+    Returns:
+        np.ndarray: Estimated size of each episode in bytes
+    """
+    shard_lengths = list(split_info.shard_lengths)
+    return np.repeat(
+        [size / max(1, length) for size, length in zip(file_sizes, shard_lengths)], shard_lengths
+    ).astype(np.float64)
+
+
+def split_by_size(sizes, num_shards):
+    """Split episodes into contiguous ranges of near-equal total size.
+
+    Every episode goes to the shard its midpoint falls into when the
+    cumulative size is divided into `num_shards` equal parts, so every shard
+    is within one episode of its share, and the split only depends on the
+    sizes. Ranges are contiguous so each node streams a single range.
+
+    Args:
+        sizes: Size of each episode
+        num_shards: Number of shards
+
+    Returns:
+        list: (start, end) tuple per shard, both inclusive, or None for an empty shard
+    """
+    sizes = np.asarray(sizes, dtype=np.float64)
+    if num_shards < 1:
+        raise ValueError(f"Invalid number of shards: {num_shards}")
+    if not len(sizes):
+        return [None] * num_shards
+
+    midpoints = np.cumsum(sizes) - sizes / 2
+    # Episodes excluded by an index weigh nothing, possibly all of them
+    owners = np.minimum((midpoints * num_shards / max(sizes.sum(), 1e-9)).astype(np.int64), num_shards - 1)
+    ranges = []
+    for shard_index in range(num_shards):
+        episodes = np.flatnonzero(owners == shard_index)
+        ranges.append((int(episodes[0]), int(episodes[-1])) if len(episodes) else None)
+    return ranges
+
+
+def plan_shard(dataset_name, shard_index, num_shards, source_options=None, split="train", episode_index=None):
+    """Get the episode range a shard converts
+
+    All nodes compute the same plan from the dataset metadata and the sizes
+    of its shard files, so they need no coordination. Sizes are read from
+    the source the episodes are read from, e.g. the cache when offline, and
+    planning fails rather than guess when they cannot be read, as nodes
+    guessing differently would skip or repeat episodes. With an episode
+    index, the exact sizes of the indexed episodes are used instead, and
+    episodes a query of the index excluded count as empty; an index of all
+    episodes needs no shard file sizes.
+
+    Args:
+        dataset_name: Name of the dataset
+        shard_index: Index of this shard, from 0 to `num_shards - 1`
+        num_shards: Number of shards
+        source_options: Keyword arguments for `load_builder`, e.g. the cache directory
+        split: Name of the split
+        episode_index: An `EpisodeIndex` of the dataset, shared by all nodes
+
+    Returns:
+        tuple: (start, end) episode range, both inclusive, or None if the shard is empty
+
+    Raises:
+        ValueError: If the shard index is out of range, or if the sizes of the shard files cannot be read
+    """
+    import tensorflow as tf
+
+    from open_x_embodiment.cache import CacheMissError
+    from open_x_embodiment.data_loader import load_builder, shard_file_sizes
+
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Shard index {shard_index} is out of range for {num_shards} shards")
+    source_options = dict(source_options or {})
+    # An empty episode range only mirrors the metadata into the cache
+    try:
+        builder = load_builder(dataset_name, 0, -1, **source_options)
+    except CacheMissError as e:
+        raise ValueError(f"Could not load the metadata of {dataset_name}: {e}") from e
+    split_info = builder.info.splits[split]
+    num_episodes = sum(split_info.shard_lengths)
+    if episode_index is not None and len(np.unique(episode_index.episodes[episode_index.episodes < num_episodes])) \
+            == num_episodes:
+        sizes = np.zeros(num_episodes)
+    else:
+        try:
+            file_sizes = shard_file_sizes(dataset_name, split_info.filenames, **source_options)
+        except (CacheMissError, tf.errors.OpError) as e:
+            raise ValueError(f"Could not read the sizes of the shard files of {dataset_name} ({e}). Every node must "
+                             f"plan from the same sizes; pass an index of the whole dataset with --index "
+                             f"instead") from e
+        sizes = estimate_episode_sizes(split_info, file_sizes)
+    if episode_index is not None:
+        indexed = episode_index.episodes[episode_index.episodes < len(sizes)]
+        sizes[indexed] = episode_index.sizes(indexed)
+        sizes[[episode for episode in episode_index.excluded if episode < len(sizes)]] = 0.0
+
+    ranges = split_by_size(sizes, num_shards)
+    shard_range = ranges[shard_index]
+    if shard_range is None:
+        print(f"Shard {shard_index}/{num_shards} of {dataset_name} is empty")
+    else:
+        start, end = shard_range
+        print(f"Shard {shard_index}/{num_shards} of {dataset_name}: episodes {start} to {end} of "
+              f"{len(sizes)}, about {sizes[start:end + 1].sum() / 1e6:.1f} of {sizes.sum() / 1e6:.1f} MB")
+    return shard_range
+
+
+def merge_manifests(output_dir, filename=MANIFEST_FILENAME):
+    """Merge the manifest fragments of all shards into one manifest.
+
+    The merged manifest holds the latest record of every episode, ordered by
+    dataset and episode number and tagged with the shard that wrote it. It replaces any
+    previous merged manifest atomically.
+
+    Args:
+        output_dir: Directory holding the manifest fragments
+        filename: Name of the merged manifest
+
+    Returns:
+        dict: Summary with the number of episodes per status and the missing shards
+    """
+    fragments = {}
+    for name in sorted(os.listdir(output_dir)):
+        match = _SHARD_MANIFEST_RE.match(name)
+        if match:
+            fragments[name] = (int(match.group(1)), int(match.group(2)))
+    if not fragments:
+        raise FileNotFoundError(f"No manifest fragments found in {output_dir}")
+    shard_counts = {num_shards for _, num_shards in fragments.values()}
+    if len(shard_counts) > 1:
+        raise ValueError(f"Manifest fragments of different numbers of shards: {sorted(shard_counts)}")
+    num_shards = shard_counts.pop()
+
+    records = {}
+    for name, (shard_index, _) in fragments.items():
+        for key, record in Manifest(output_dir, name).load().items():
+            record = dict(record, shard_index=shard_index)
+            previous = records.get(key)
+            if previous is not None:
+                print(f"Episode {key[1]} of {key[0]} was converted by shards {previous['shard_index']} "
+                      f"and {shard_index}")
+                if previous.get("recorded_at", 0) > record.get("recorded_at", 0):
+                    continue
+            records[key] = record
+
+    path = os.path.join(output_dir, filename)
+    partial_path = path + ".partial"
+    with open(partial_path, "w") as f:
+        for key in sorted(records):
+            f.write(json.dumps(records[key], sort_keys=True) + "\n")
+    os.replace(partial_path, path)
+
+    found = {shard_index for shard_index, _ in fragments.values()}
+    summary = {
+        "fragments": len(fragments),
+        "num_shards": num_shards,
+        "missing_shards": sorted(set(range(num_shards)) - found),
+        "episodes": len(records),
+        "statuses": dict(collections.Counter(record["status"] for record in records.values())),
+    }
+    print(f"Merged {len(fragments)} of {num_shards} manifest fragments into {path}: {len(records)} episodes, "
+          + ", ".join(f"{count} {status}" for status, count in sorted(summary["statuses"].items())))
+    if summary["missing_shards"]:
+        print(f"  Shards without a manifest fragment: {', '.join(map(str, summary['missing_shards']))}")
+    return summary
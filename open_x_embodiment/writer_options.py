@@ -0,0 +1,96 @@
+"""Chunk compression, chunk size and index options of the MCAP writer"""
+# Copyright 2025 coScene. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from foxglove.mcap import MCAPCompression, MCAPWriteOptions
+
+# Supported chunk compressions
+MCAP_COMPRESSIONS = ("zstd", "lz4", "none")
+
+# Writer settings trading file size against write speed. Every preset
+# lists all options, so applying one never depends on the writer defaults.
+WRITER_PRESETS = {
+    # Smallest files: highest regular zstd level and large chunks, which
+    # compress better and still seek quickly with message indexes
+    "archive": {
+        "compression": "zstd",
+        "compression_level": 19,
+        "chunk_size": 8 * 1024 * 1024,
+        "message_indexes": True,
+    },
+    # Fastest writes: lz4 and large chunks, so fewer chunks are compressed and indexed
+    "fast": {
+        "compression": "lz4",
+        "compression_level": 0,
+        "chunk_size": 16 * 1024 * 1024,
+        "message_indexes": True,
+    },
+}
+
+_COMPRESSIONS = {
+    "zstd": MCAPCompression.Zstd,
+    "lz4": MCAPCompression.Lz4,
+    "none": None,
+}
+
+
+def resolve_writer_options(preset=None, **options):
+    """Combine a preset with explicitly set writer options
+
+    Args:
+        preset: Name of a preset in `WRITER_PRESETS`, or None
+        **options: Writer options overriding the preset; options that are None are ignored
+
+    Returns:
+        dict: Writer options for `mcap_write_options`
+    """
+    if preset is not None and preset not in WRITER_PRESETS:
+        raise ValueError(f"Unknown writer preset '{preset}', expected one of {', '.join(WRITER_PRESETS)}")
+    resolved = dict(WRITER_PRESETS[preset]) if preset else {}
+    resolved.update({key: value for key, value in options.items() if value is not None})
+    return resolved
+
+
+def mcap_write_options(compression="zstd", compression_level=0, chunk_size=None, message_indexes=True):
+    """Build the options of `foxglove.open_mcap`
+
+    Writer options are passed around as plain dictionaries with these
+    arguments as keys, because `MCAPWriteOptions` cannot be sent to batch
+    worker processes.
+
+    Args:
+        compression: Chunk compression, one of `MCAP_COMPRESSIONS`
+        compression_level: Compression level, 0 for the compressor's default
+        chunk_size: Target uncompressed size of a chunk in bytes, None for the writer's default
+        message_indexes: Whether to write message and chunk indexes, which let readers seek
+            without scanning the whole file
+
+    Returns:
+        MCAPWriteOptions: Options for `foxglove.open_mcap`
+    """
+    if compression not in _COMPRESSIONS:
+        raise ValueError(f"Unknown MCAP compression '{compression}', expected one of {', '.join(MCAP_COMPRESSIONS)}")
+    if compression_level < 0:
+        raise ValueError(f"Invalid compression level: {compression_level}")
+    options = {
+        "compression": _COMPRESSIONS[compression],
+        "compression_level": compression_level,
+        "emit_message_indexes": message_indexes,
+        "emit_chunk_indexes": message_indexes,
+    }
+    if chunk_size is not None:
+        if chunk_size <= 0:
+            raise ValueError(f"Invalid chunk size: {chunk_size}")
+        options["chunk_size"] = chunk_size
+    return MCAPWriteOptions(**options)
@@ -32,14 +32,20 @@ setup(
         "License :: OSI Approved :: Apache 2 License",
         "Operating System :: OS Independent",
     ],
-    python_requires=">=3.6",
+    # foxglove-sdk, TensorFlow 2 and tensorflow-datasets releases need 3.10
+    python_requires=">=3.10",
     install_requires=[
         "tensorflow",
         "tensorflow-datasets",
         "foxglove-sdk",
         "numpy",
+        "protobuf",
         "gcsfs",
     ],
+    extras_require={
+        # MCAP reader used by the benchmarks to read converted files back
+        "benchmarks": ["mcap"],
+    },
     entry_points={
         'console_scripts': [
             'coscene-converter=cli:main',